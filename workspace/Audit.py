@@ -0,0 +1,304 @@
+"""Audit of logged interactive proof transcripts
+
+This file contains a pipeline that re-checks logged transcripts of the
+interactive proof of knowledge and proof of equality after the fact.
+The transcripts are read in the proof record format of CommandLine.py,
+the public keys followed by the proof, (h, a, e, z) for pok and
+(h1, h2, a1, a2, e, z) for poe, e.g. as written by
+
+    python3 -m CommandLine prove poe -i keys.bin -o transcripts.bin
+
+and audited from the workspace folder with
+
+    python3 -m Audit poe -i transcripts.bin -o report.txt --workers 8
+
+The audit does three things:
+
+    - every transcript is verified, in batches of --batch-size transcripts
+      with SigmaProtocol.verifyBatch, and the transcripts of a batch that
+      fails are verified one by one, so a few invalid transcripts only cost
+      their own batches. Public keys go through KeyTables.py, so the
+      transcripts of the same key share their key in the batch.
+    - repeated challenges are detected. The challenge of an interactive
+      proof is drawn at random by the Verifier, so a challenge that occurs
+      twice in the log points to a broken source of randomness. A broken
+      source usually repeats itself soon, so only the last --window
+      challenges are kept, as 16 byte hashes, and a challenge is compared
+      with at least the last window/2 of them.
+    - a report with one line per finding, and a summary, are written.
+
+The stages overlap: a background thread reads and splits the log into
+chunks, the worker processes decode and verify the chunks, and the
+current process checks the challenges and writes the report while the
+workers verify the next chunks. The memory of the audit is bounded: the
+challenges take about CHALLENGE_BYTES bytes each, for at most --window
+transcripts, about 136 MiB with the default CHALLENGE_WINDOW.
+
+The report has one line per finding, tab separated:
+
+    <index> rejected                        the transcript is invalid
+    <index> malformed                       the record could not be decoded
+    <index> repeated-challenge <first>      the challenge was used before by transcript <first>
+
+The indices count the records of the log from 0.
+
+This file requires that the environment you are running on have the "petlib"
+and "ZKSK" libraries installed.
+
+The file contains the following functions:
+    - audit: returns a stream of audit results for a stream of transcript records
+    - getStats: returns the counters of the audit
+    - resetStats: sets all counters to zero
+    - formatStats: returns the counters as printable lines
+    - main: runs the audit from the command line
+"""
+
+from contextlib import nullcontext
+from hashlib import sha256
+from petlib import ec, bn
+import CommandLine
+import Encoding
+import KeyTables
+import Parallel
+import SigmaProtocol
+import VerifyStats
+import argparse
+import sys
+
+PROTOCOLS = ("pok", "poe")
+BATCH_SIZE = 64
+
+#The number of challenges kept to find repeated challenges, the length
+#of the hash kept per challenge and the memory it takes
+CHALLENGE_WINDOW = 2**20
+FINGERPRINT_BYTES = 16
+CHALLENGE_BYTES = 136
+
+def _emptyStats():
+    return {"records": 0, "accepted": 0, "rejected": 0, "malformed": 0,
+            "repeated": 0, "batches": 0, "fallbacks": 0}
+
+_stats = _emptyStats()
+
+def _decode(name, group, data):
+    #The statement, commitments, challenge and responses of a transcript, None if
+    #malformed, including points that are not on the curve, so one bad record
+    #does not stop the audit
+    rows = CommandLine.PROTOCOLS[name].publics
+    try:
+        statement, proof = Encoding.splitRecord(data, rows)
+        statement = KeyTables.decodeStatement(group, statement)
+        proof = Encoding.decodeRecord(group, proof)
+    except ValueError:
+        return None
+
+    if len(proof) != rows + 2 or not isinstance(proof[rows], bn.Bn):
+        return None
+    if not all(isinstance(h, ec.EcPt) for h in statement):
+        return None
+
+    return statement, proof[:rows], proof[rows], proof[rows+1:]
+
+def _fingerprint(e):
+    #A short hash of the challenge, the encoding keeps the sign of e
+    return sha256(Encoding.encodeRecord((e,))).digest()[:FINGERPRINT_BYTES]
+
+def _auditChunk(chunk):
+    #Verifies the transcripts of one chunk in batches, and verifies the
+    #transcripts of a failed batch one by one. Returns True, False or None
+    #(malformed) and the hash of the challenge for every transcript, and
+    #the number of batches and failed batches
+    name, records, batch_size = chunk
+    group, q, generators = CommandLine.getParameters(name)
+    relation = CommandLine.PROTOCOLS[name].module.getRelation(group, *generators)
+
+    instances = [_decode(name, group, data) for data in records]
+    results = [None if instance is None else False for instance in instances]
+    decoded = [i for i, instance in enumerate(instances) if instance is not None]
+
+    batches = fallbacks = 0
+    for start in range(0, len(decoded), batch_size):
+        batch = decoded[start:start+batch_size]
+        batches += 1
+        if SigmaProtocol.verifyBatch(relation, [instances[i] for i in batch]):
+            for i in batch:
+                results[i] = True
+        else:
+            fallbacks += 1
+            for i in batch:
+                results[i] = SigmaProtocol.verify(relation, *instances[i])
+
+    challenges = [None if instance is None else _fingerprint(instance[2]) for instance in instances]
+
+    return results, challenges, batches, fallbacks
+
+def audit(name, records, workers=None, chunk_size=Parallel.DEFAULT_CHUNK_SIZE, batch_size=BATCH_SIZE,
+          window=CHALLENGE_WINDOW):
+    """Audits a stream of logged interactive transcripts
+
+    The counters of the audit are kept in this module, see getStats.
+    The challenges are kept in two generations of window/2 challenges,
+    when the newer one is full the older one is dropped, so a repeated
+    challenge is found if it is at most window/2 transcripts, and may be
+    found if it is up to window transcripts, after the first one.
+
+    Args:
+        name (str): the protocol, "pok" or "poe"
+        records (iterable of bytes): the encoded transcript records
+        workers (int): the number of worker processes, if None or 1
+                       the transcripts are verified in the current process
+        chunk_size (int): the number of transcripts handed to a worker at a time
+        batch_size (int): the number of transcripts verified together
+        window (int): the number of challenges kept, at least 2
+
+    Returns:
+        (generator of tuples): for every transcript, in order, its index,
+                               True if accepted, False if rejected and None
+                               if malformed, and the index of the first
+                               transcript with the same challenge or None
+    """
+
+    if name not in PROTOCOLS:
+        raise ValueError("only the interactive protocols can be audited")
+    if window < 2:
+        raise ValueError("the challenge window must be at least 2")
+
+    seen, older = {}, {}
+    index = 0
+    chunks = ((name, chunk, batch_size) for chunk in Parallel.prefetch(Parallel.chunked(records, chunk_size)))
+
+    with CommandLine.workerPool(name, workers) as pool:
+        for results, challenges, batches, fallbacks in Parallel.mapChunks(_auditChunk, chunks, workers, **pool):
+            _stats["batches"] += batches
+            _stats["fallbacks"] += fallbacks
+
+            for result, e in zip(results, challenges):
+                first = None
+                if e is not None:
+                    first = seen.get(e)
+                    if first is None:
+                        first = older.get(e)
+                    if first is not None:
+                        _stats["repeated"] += 1
+                    else:
+                        seen[e] = index
+                        if len(seen) >= window // 2:
+                            seen, older = {}, seen
+
+                _stats["records"] += 1
+                if result is None:
+                    _stats["malformed"] += 1
+                elif result:
+                    _stats["accepted"] += 1
+                else:
+                    _stats["rejected"] += 1
+
+                yield index, result, first
+                index += 1
+
+def getStats():
+    """Returns the counters of the audit
+
+    No args
+
+    Returns:
+        (dict): the number of transcripts, accepted, rejected and malformed
+                transcripts, repeated challenges, batches and failed batches
+    """
+
+    return dict(_stats)
+
+def resetStats():
+    """Sets all counters to zero
+
+    No args
+
+    Returns:
+        None
+    """
+
+    global _stats
+    _stats = _emptyStats()
+
+def formatStats(stats=None):
+    """Returns the counters as printable lines
+
+    Args:
+        stats (dict): counters as returned by getStats,
+                      the counters of this process if None
+
+    Returns:
+        (str): one line per counter
+    """
+
+    if stats is None:
+        stats = getStats()
+
+    names = ("records", "accepted", "rejected", "malformed", "repeated", "batches", "fallbacks")
+
+    return "\n".join("%-14s %12d" % (name, stats[name]) for name in names)
+
+def main(argv=None):
+    """Runs the audit from the command line
+
+    Args:
+        argv (list of str): the arguments, the arguments of the process if None
+
+    Returns:
+        (int): the exit status, 1 if there was any finding
+    """
+
+    parser = argparse.ArgumentParser(prog="python3 -m Audit",
+                                     description="Audit of logged interactive proof transcripts")
+    parser.add_argument("protocol", choices=PROTOCOLS)
+    parser.add_argument("-i", "--input", help="transcript records, standard input if not given")
+    parser.add_argument("-o", "--output", help="report file, standard output if not given")
+    parser.add_argument("-w", "--workers", type=int, default=1, help="the number of worker processes")
+    parser.add_argument("-c", "--chunk-size", type=int, default=Parallel.DEFAULT_CHUNK_SIZE,
+                        help="the number of transcripts handed to a worker at a time")
+    parser.add_argument("-b", "--batch-size", type=int, default=BATCH_SIZE,
+                        help="the number of transcripts verified together")
+    parser.add_argument("--window", type=int, default=CHALLENGE_WINDOW,
+                        help="the number of challenges kept to find repeated challenges")
+    parser.add_argument("-q", "--quiet", action="store_true", help="do not print the summary")
+    args = parser.parse_args(argv)
+
+    if args.workers < 1 or args.chunk_size < 1 or args.batch_size < 1:
+        print("error: --workers, --chunk-size and --batch-size must be at least 1", file=sys.stderr)
+        return 2
+    if args.window < 2:
+        print("error: --window must be at least 2", file=sys.stderr)
+        return 2
+
+    resetStats()
+    latencies = []
+    start = VerifyStats.clock()
+
+    source = open(args.input, "rb") if args.input and args.input != "-" else nullcontext(sys.stdin.buffer)
+    report = open(args.output, "w") if args.output and args.output != "-" else nullcontext(sys.stdout)
+    try:
+        with source as stream, report as output:
+            results = audit(args.protocol, Encoding.readRecords(stream),
+                            args.workers, args.chunk_size, args.batch_size, args.window)
+            for index, result, first in CommandLine.timeChunks(results, args.chunk_size, latencies):
+                if result is None:
+                    output.write("%d\tmalformed\n" % index)
+                elif not result:
+                    output.write("%d\trejected\n" % index)
+                if first is not None:
+                    output.write("%d\trepeated-challenge\t%d\n" % (index, first))
+    except ValueError as error:
+        print("error:", error, file=sys.stderr)
+        return 1
+
+    stats = getStats()
+    if not args.quiet:
+        print(CommandLine.formatSummary("audit", stats["records"], VerifyStats.clock() - start, latencies),
+              file=sys.stderr)
+        print(formatStats(stats), file=sys.stderr)
+
+    return int(stats["rejected"] + stats["malformed"] + stats["repeated"] > 0)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
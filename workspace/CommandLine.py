@@ -0,0 +1,429 @@
+"""Command line interface for bulk key generation, proving and verification
+
+This file makes the four protocols of the project, the interactive and
+non-interactive proofs of knowledge and proofs of equality, usable from
+batch jobs. Run it from the workspace folder as
+
+    python3 -m CommandLine keygen nipok -n 1000 -o keys.bin
+    python3 -m CommandLine prove nipok -i keys.bin -o proofs.bin --workers 4
+    python3 -m CommandLine verify nipok -i proofs.bin --workers 4
+
+Records are read and written in the stream format of Encoding.py, and
+without -i or -o the records are read from standard input and written to
+standard output, so the commands can be connected with pipes.
+
+    - keygen writes one key record per key: the witness followed by the
+      public keys, (w, h) for pok and nipok and (w, h1, h2) for poe and nipoe.
+      The records hold the secret witnesses and must be kept private.
+    - prove reads key records and writes one proof record per key:
+      the public keys followed by the proof, e.g. (h, a, e, z) for pok.
+    - verify reads proof records and writes one line per record,
+      "accepted" or "rejected", if -o is given. The exit status is 1
+      if any proof is rejected.
+
+The records are processed in chunks of --chunk-size records, spread over
+--workers worker processes. The public parameters are the ones of the
+groupGen function of every protocol, so they are not part of the records.
+
+At the end a summary with the number of records, the throughput and
+the latency per chunk is written to standard error, and for verify
+the rejection counters of VerifyStats.py and the hit rate and memory
+of the public key tables of KeyTables.py as well.
+
+This file requires that the environment you are running on have the "petlib"
+and "ZKSK" libraries installed.
+
+The file contains the following functions:
+    - keygen: returns a stream of encoded key records
+    - prove: returns a stream of encoded proof records for a stream of key records
+    - verify: returns a stream of verification results for a stream of proof records
+    - keyTableStats: returns the key table counters of the current process and the workers
+    - getParameters: returns the public parameters of a protocol
+    - workerPool: returns the arguments that set up the workers of a protocol
+    - timeChunks: passes values on and records the time spent on every chunk
+    - formatSummary: returns the throughput and latency summary of a command
+    - main: runs the command line interface
+"""
+
+from collections import deque, namedtuple
+from contextlib import nullcontext
+from petlib import ec
+import ProofOfKnowledge as PoK
+import NIProofOfKnowledge as NIPoK
+import ProofOfEquality as PoE
+import NIProofOfEquality as NIPoE
+import Encoding
+import KeyTables
+import Parallel
+import SharedTables
+import VerifyStats
+import argparse
+import os
+import sys
+
+#The protocol modules, their key generation functions, whether the
+#prover takes the witnesses (interactive) or whole key sets (non-interactive),
+#the number of public keys in a key set and the number of generators
+#groupGen takes from Generators.py, which are shared with the workers
+Protocol = namedtuple("Protocol", ["module", "keyGen", "interactive", "publics", "generators"])
+
+PROTOCOLS = {
+    "pok": Protocol(PoK, PoK.keyGen, True, 1, 0),
+    "nipok": Protocol(NIPoK, NIPoK.keyGen, False, 1, 0),
+    "poe": Protocol(PoE, PoE.keygen, True, 2, 2),
+    "nipoe": Protocol(NIPoE, NIPoE.keyGen, False, 2, 2),
+}
+
+_parameters = {}
+_workerTables = {}
+
+def getParameters(name):
+    """Returns the public parameters of a protocol, generated once per process
+
+    Args:
+        name (str): the protocol, one of PROTOCOLS
+
+    Returns:
+        group (EcGroup): the EC group from an EC over a finite field
+        q (Bn): the group order
+        generators (list of EcPt): the generators of the groupGen function of the protocol
+    """
+
+    parameters = _parameters.get(name)
+    if parameters is None:
+        group, q, *generators = PROTOCOLS[name].module.groupGen()
+        parameters = _parameters[name] = (group, q, generators)
+
+    return parameters
+
+def workerPool(name, workers):
+    """Returns the arguments of Parallel.mapChunks that set up the workers of a protocol
+
+    The generators of the protocol are shared with the worker processes
+    through SharedTables.py, so the workers do not compute them again.
+
+    Args:
+        name (str): the protocol, one of PROTOCOLS
+        workers (int): the number of worker processes
+
+    Returns:
+        (context manager): gives the initializer and initargs arguments,
+                           none if the chunks are processed in the current process
+    """
+
+    count = PROTOCOLS[name].generators
+    if workers is None or workers <= 1 or not count:
+        return nullcontext({})
+
+    return SharedTables.sharedGenerators(count, getParameters(name)[0])
+
+def _keygenChunk(chunk):
+    #Generates the encoded key records for one chunk
+    name, count = chunk
+    group, q, generators = getParameters(name)
+    keyGen = PROTOCOLS[name].keyGen
+
+    return [Encoding.encodeRecord(keyGen(q, *generators)) for _ in range(count)]
+
+def keygen(name, count, workers=None, chunk_size=Parallel.DEFAULT_CHUNK_SIZE):
+    """Generates key sets for a protocol
+
+    Args:
+        name (str): the protocol, one of PROTOCOLS
+        count (int): the number of key sets
+        workers (int): the number of worker processes, if None or 1
+                       the keys are generated in the current process
+        chunk_size (int): the number of key sets handed to a worker at a time
+
+    Returns:
+        (generator of bytes): the encoded key records, witness followed by public keys
+    """
+
+    chunks = ((name, min(chunk_size, count - start)) for start in range(0, count, chunk_size))
+    with workerPool(name, workers) as pool:
+        for records in Parallel.mapChunks(_keygenChunk, chunks, workers, **pool):
+            yield from records
+
+def prove(name, keys, seed=None, workers=None, chunk_size=Parallel.DEFAULT_CHUNK_SIZE):
+    """Generates proofs for a stream of key records
+
+    Args:
+        name (str): the protocol, one of PROTOCOLS
+        keys (iterable of bytes): the encoded key records
+        seed (bytes): if given, the randomness is derived deterministically,
+                      as in the proofGen_batch functions, only for the
+                      non-interactive protocols
+        workers (int): the number of worker processes, if None or 1
+                       the proofs are generated in the current process
+        chunk_size (int): the number of proofs handed to a worker at a time
+
+    Returns:
+        (generator of bytes): the encoded proof records, public keys followed by the proof
+
+    Raises:
+        ValueError: if a key record is malformed, or if a seed is given
+                    for an interactive protocol
+    """
+
+    protocol = PROTOCOLS[name]
+    group, q, generators = getParameters(name)
+
+    #The public keys wait here until the proof of their key set comes back,
+    #proofGen_batch only reads a bounded number of chunks ahead
+    publics = deque()
+
+    def keySets():
+        for data in keys:
+            key = Encoding.decodeRecord(group, data)
+            if len(key) != protocol.publics + 1:
+                raise ValueError("malformed key record")
+            publics.append(Encoding.encodeRecord(key[1:]))
+            yield key[0] if protocol.interactive else key
+
+    #An encoded record is the concatenation of its encoded values,
+    #so the public keys are prepended to the encoded proof as they are
+    proofs = protocol.module.proofGen_batch(q, *generators, keySets(), seed, workers, chunk_size)
+    for proof in proofs:
+        yield publics.popleft() + proof
+
+def _verifyChunk(chunk):
+    #Verifies the encoded proof records of one chunk
+    name, records = chunk
+    protocol = PROTOCOLS[name]
+    group, q, generators = getParameters(name)
+
+    results = []
+    for data in records:
+        #The public keys are decoded through KeyTables,
+        #so frequently used keys are verified with their tables
+        try:
+            publicKeys, proof = Encoding.splitRecord(data, protocol.publics)
+            publicKeys = KeyTables.decodeStatement(group, publicKeys)
+            proof = Encoding.decodeRecord(group, proof)
+        except ValueError:
+            results.append(VerifyStats.reject("decode"))
+            continue
+
+        if not all(isinstance(h, ec.EcPt) for h in publicKeys):
+            results.append(VerifyStats.reject("decode"))
+            continue
+
+        results.append(protocol.module.verify(group, *generators, *publicKeys, proof))
+
+    return results
+
+def _verifyEncodedChunk(chunk):
+    #Verifies one chunk in a worker process and sends back the counters
+    #of the chunk and the key tables of the worker along with the results
+    VerifyStats.resetStats()
+    KeyTables.resetStats()
+    results = _verifyChunk(chunk)
+
+    return results, VerifyStats.getStats(), KeyTables.getStats(), os.getpid()
+
+def verify(name, proofs, workers=None, chunk_size=Parallel.DEFAULT_CHUNK_SIZE):
+    """Verifies a stream of proof records
+
+    The rejection counters and the key table counters of the workers are
+    added to the counters of the current process, see VerifyStats.py and
+    KeyTables.py. Frequently used public keys get precomputed tables.
+
+    Args:
+        name (str): the protocol, one of PROTOCOLS
+        proofs (iterable of bytes): the encoded proof records
+        workers (int): the number of worker processes, if None or 1
+                       the proofs are verified in the current process
+        chunk_size (int): the number of proofs handed to a worker at a time
+
+    Returns:
+        (generator of bool): True for every accepted proof, else False,
+                             in the order of the records
+    """
+
+    chunks = ((name, chunk) for chunk in Parallel.chunked(proofs, chunk_size))
+
+    if workers is None or workers <= 1:
+        for results in Parallel.mapChunks(_verifyChunk, chunks):
+            yield from results
+        return
+
+    with workerPool(name, workers) as pool:
+        for results, stats, keyStats, pid in Parallel.mapChunks(_verifyEncodedChunk, chunks, workers, **pool):
+            VerifyStats.merge(stats)
+            KeyTables.merge(keyStats)
+            _workerTables[pid] = (keyStats["tables"], keyStats["memory"])
+            yield from results
+
+def keyTableStats():
+    """Returns the counters of KeyTables, including the tables of the workers of verify
+
+    No args
+
+    Returns:
+        (dict): the counters as returned by KeyTables.getStats, with the number
+                of tables and their memory summed over the processes
+    """
+
+    stats = KeyTables.getStats()
+    for tables, memory in _workerTables.values():
+        stats["tables"] += tables
+        stats["memory"] += memory
+
+    return stats
+
+def timeChunks(values, chunk_size, latencies):
+    """Passes values on and records the time spent on every chunk of values
+
+    Args:
+        values (iterable): the values
+        chunk_size (int): the number of values in a chunk
+        latencies (list): the time of every chunk in nanoseconds,
+                          from the end of the previous chunk, is appended here
+
+    Returns:
+        (generator): the values
+    """
+
+    last = VerifyStats.clock()
+    count = 0
+    for value in values:
+        yield value
+        count += 1
+        if count % chunk_size == 0:
+            now = VerifyStats.clock()
+            latencies.append(now - last)
+            last = now
+
+    if count % chunk_size:
+        latencies.append(VerifyStats.clock() - last)
+
+def formatSummary(command, count, elapsed_ns, latencies):
+    """Returns the throughput and latency summary of a command
+
+    Args:
+        command (str): the name of the command
+        count (int): the number of records processed
+        elapsed_ns (int): the total time in nanoseconds
+        latencies (list of int): the time spent on every chunk in nanoseconds
+
+    Returns:
+        (str): the summary as printable lines
+    """
+
+    seconds = elapsed_ns / 1e9
+    lines = ["%-14s %12d" % (command, count),
+             "%-14s %12.3f" % ("time (s)", seconds),
+             "%-14s %12.1f" % ("records/s", count / seconds if seconds else 0.0)]
+
+    if count:
+        lines.append("%-14s %12.1f" % ("us/record", elapsed_ns / count / 1e3))
+    if latencies:
+        ordered = sorted(latencies)
+        lines.append("%-14s %12.2f" % ("chunk p50 (ms)", ordered[len(ordered) // 2] / 1e6))
+        lines.append("%-14s %12.2f" % ("chunk p99 (ms)", ordered[min(len(ordered) - 1, len(ordered) * 99 // 100)] / 1e6))
+        lines.append("%-14s %12.2f" % ("chunk max (ms)", ordered[-1] / 1e6))
+
+    return "\n".join(lines)
+
+def _open(path, mode):
+    #Opens a file, or standard input or output if the path is None or "-"
+    if path is None or path == "-":
+        stream = sys.stdin.buffer if "r" in mode else sys.stdout.buffer
+        return nullcontext(stream)
+
+    return open(path, mode)
+
+def _parser():
+    parser = argparse.ArgumentParser(prog="python3 -m CommandLine",
+                                     description="Bulk key generation, proving and verification")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    keygenParser = commands.add_parser("keygen", help="generate key records")
+    keygenParser.add_argument("-n", "--count", type=int, required=True, help="the number of key sets")
+
+    proveParser = commands.add_parser("prove", help="generate proof records from key records")
+    proveParser.add_argument("--seed", type=bytes.fromhex,
+                             help="hex seed for deterministic randomness, random if not given, "
+                                  "only for nipok and nipoe")
+
+    verifyParser = commands.add_parser("verify", help="verify proof records")
+
+    for command in (keygenParser, proveParser, verifyParser):
+        command.add_argument("protocol", choices=sorted(PROTOCOLS))
+        if command is not keygenParser:
+            command.add_argument("-i", "--input", help="input file, standard input if not given")
+        command.add_argument("-o", "--output", help="output file, standard output if not given"
+                             if command is not verifyParser else "file for the result of every record")
+        command.add_argument("-w", "--workers", type=int, default=1, help="the number of worker processes")
+        command.add_argument("-c", "--chunk-size", type=int, default=Parallel.DEFAULT_CHUNK_SIZE,
+                             help="the number of records handed to a worker at a time")
+        command.add_argument("-q", "--quiet", action="store_true", help="do not print the summary")
+
+    return parser
+
+def main(argv=None):
+    """Runs the command line interface
+
+    Args:
+        argv (list of str): the arguments, the arguments of the process if None
+
+    Returns:
+        (int): the exit status, 1 if a proof was rejected or a record was malformed
+    """
+
+    args = _parser().parse_args(argv)
+    if args.workers < 1 or args.chunk_size < 1:
+        print("error: --workers and --chunk-size must be at least 1", file=sys.stderr)
+        return 2
+    #The challenges of the interactive protocols are random, so two runs
+    #with the same seed would reveal the witnesses
+    if args.command == "prove" and args.seed is not None and PROTOCOLS[args.protocol].interactive:
+        print("error: --seed cannot be used with the interactive protocols", file=sys.stderr)
+        return 2
+
+    latencies = []
+    status = 0
+    start = VerifyStats.clock()
+
+    try:
+        if args.command == "keygen":
+            with _open(args.output, "wb") as output:
+                records = keygen(args.protocol, args.count, args.workers, args.chunk_size)
+                count = Encoding.writeRecords(output, timeChunks(records, args.chunk_size, latencies))
+
+        elif args.command == "prove":
+            with _open(args.input, "rb") as stream, _open(args.output, "wb") as output:
+                records = prove(args.protocol, Encoding.readRecords(stream), args.seed,
+                                args.workers, args.chunk_size)
+                count = Encoding.writeRecords(output, timeChunks(records, args.chunk_size, latencies))
+
+        else:
+            VerifyStats.resetStats()
+            KeyTables.resetStats()
+            _workerTables.clear()
+            output = open(args.output, "w") if args.output else nullcontext()
+            with _open(args.input, "rb") as stream, output:
+                results = verify(args.protocol, Encoding.readRecords(stream), args.workers, args.chunk_size)
+                count = 0
+                for result in timeChunks(results, args.chunk_size, latencies):
+                    count += 1
+                    if not result:
+                        status = 1
+                    if args.output:
+                        output.write("accepted\n" if result else "rejected\n")
+
+    except ValueError as error:
+        print("error:", error, file=sys.stderr)
+        return 1
+
+    if not args.quiet:
+        print(formatSummary(args.command, count, VerifyStats.clock() - start, latencies), file=sys.stderr)
+        if args.command == "verify":
+            print(VerifyStats.formatStats(), file=sys.stderr)
+            print(KeyTables.formatStats(keyTableStats()), file=sys.stderr)
+
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
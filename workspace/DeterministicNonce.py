@@ -0,0 +1,164 @@
+"""Deterministic derivation of the Prover randomness
+
+This file contains a deterministic alternative to drawing the Prover
+randomness r with "q.random()" in the commitment step of the protocols.
+The randomness is derived from the witness, the statement and a seed using
+the HMAC-DRBG construction described in section 3.2 of RFC 6979,
+"Deterministic Usage of the Digital Signature Algorithm (DSA) and
+Elliptic Curve Digital Signature Algorithm (ECDSA)", with sha256 as the hash.
+
+Given the same witness, statement and seed the same randomness is returned,
+which makes benchmark runs and their transcripts reproducible.
+The seed must be fresh for every proof that is not meant to be reproduced.
+Reusing a seed for the same witness and statement together with two
+different challenges reveals the witness, as z1 - z2 = (e1 - e2)*w, so
+the interactive protocols, whose challenge is random, refuse a seed.
+If no seed is given a fresh random one is used, in which case the
+randomness is still bound to the witness and statement, but not reproducible.
+Two proof forms with different challenges for the same statement, e.g. the
+(a, z) and (e, z) forms of the non-interactive proof of knowledge, pass
+different domains, so a seed used for both forms gives different randomness.
+
+This file requires that the environment you are running on have the "petlib"
+and "hashlib" libraries installed.
+
+The file contains the following functions:
+    - newSeed: returns a fresh random seed
+    - deriveNonce: returns the Prover randomness for a single proof
+    - deriveNonces: returns the Prover randomness for a batch of proofs
+"""
+
+from petlib import bn
+from hashlib import sha256
+import hmac
+import os
+
+SEED_LENGTH = 32
+
+def newSeed():
+    """Generates a fresh random seed
+
+    No args
+
+    Returns:
+        seed (bytes): SEED_LENGTH random bytes
+    """
+
+    return os.urandom(SEED_LENGTH)
+
+def _orderParameters(q):
+    #The integer value, bit length and byte length of the group order
+    #are the same for every nonce, so they are only computed once per batch
+    q_int = int(q)
+    qbits = q_int.bit_length()
+    qlen = (qbits + 7) // 8
+
+    return q_int, qbits, qlen
+
+def _bits2int(octets, qbits):
+    #Keeps the leftmost qbits bits of the octets, as in RFC 6979 section 2.3.2
+    x = int.from_bytes(octets, "big")
+    blen = len(octets) * 8
+    if blen > qbits:
+        x >>= blen - qbits
+
+    return x
+
+def _encodeStatement(statement):
+    #Concatenates the binary encodings of the public values of the statement
+    return b"".join(value.export() for value in statement)
+
+def _messageDigest(encoded_statement, seed, domain=b""):
+    #Hashes the domain, the public statement and the seed together, this is
+    #the "message" h1 that is passed to the HMAC-DRBG. A point encoding starts
+    #with 0x02 or 0x03, so a domain starting with another byte can not be
+    #mistaken for the start of a statement
+    return sha256(domain + encoded_statement + seed).digest()
+
+def _hmacDrbg(q_int, qbits, qlen, x, h1):
+    #HMAC-DRBG from RFC 6979 section 3.2, steps b. to h.
+    x_octets = (x % q_int).to_bytes(qlen, "big")
+    h_octets = (_bits2int(h1, qbits) % q_int).to_bytes(qlen, "big")
+
+    V = b"\x01" * 32
+    K = b"\x00" * 32
+    K = hmac.new(K, V + b"\x00" + x_octets + h_octets, sha256).digest()
+    V = hmac.new(K, V, sha256).digest()
+    K = hmac.new(K, V + b"\x01" + x_octets + h_octets, sha256).digest()
+    V = hmac.new(K, V, sha256).digest()
+
+    while True:
+        T = b""
+        while len(T) < qlen:
+            V = hmac.new(K, V, sha256).digest()
+            T += V
+
+        k = _bits2int(T, qbits)
+        if 1 <= k < q_int:
+            return k
+
+        K = hmac.new(K, V + b"\x00", sha256).digest()
+        V = hmac.new(K, V, sha256).digest()
+
+def deriveNonce(q, w, statement, seed=None, domain=b""):
+    """Derives the Prover randomness r for a single proof
+
+    Args:
+        q (Bn): the group order
+        w (Bn): the Prover witness
+        statement (tuple of EcPt): the public values of the proof,
+                                   e.g. the generators and public keys
+        seed (bytes): the per-proof seed, a fresh one is used if None
+        domain (bytes): the proof form, empty for the default form
+
+    Returns:
+        r (Bn): randomness in the range [1, q-1]
+    """
+
+    if seed is None:
+        seed = newSeed()
+
+    q_int, qbits, qlen = _orderParameters(q)
+    h1 = _messageDigest(_encodeStatement(statement), seed, domain)
+    k = _hmacDrbg(q_int, qbits, qlen, int(w), h1)
+
+    return bn.Bn.from_binary(k.to_bytes(qlen, "big"))
+
+def deriveNonces(q, witnesses, statements, seed=None, start=0):
+    """Derives the Prover randomness for a batch of proofs in one pass
+
+    The seed of the i'th proof is the batch seed followed by start + i as
+    an 8 byte integer, so every proof in the batch gets its own seed and
+    deriveNonce(q, w_i, statement_i, seed + (start + i).to_bytes(8, "big"))
+    returns the same randomness as the i'th element of the batch.
+
+    Args:
+        q (Bn): the group order
+        witnesses (iterable of Bn): the Prover witnesses
+        statements (iterable of tuple of EcPt): the public values of each proof
+        seed (bytes): the batch seed, a fresh one is used if None
+        start (int): the index of the first proof, used when a batch
+                     is split into several parts
+
+    Returns:
+        nonces (list of Bn): randomness in the range [1, q-1] for each proof
+    """
+
+    if seed is None:
+        seed = newSeed()
+
+    q_int, qbits, qlen = _orderParameters(q)
+
+    #Proofs in a batch usually share their statement,
+    #so the encoding of the previous statement is reused when possible
+    nonces = []
+    previous, encoded = None, b""
+    for i, (w, statement) in enumerate(zip(witnesses, statements), start):
+        if statement is not previous:
+            previous, encoded = statement, _encodeStatement(statement)
+
+        h1 = _messageDigest(encoded, seed + i.to_bytes(8, "big"))
+        k = _hmacDrbg(q_int, qbits, qlen, int(w), h1)
+        nonces.append(bn.Bn.from_binary(k.to_bytes(qlen, "big")))
+
+    return nonces
@@ -0,0 +1,225 @@
+"""Binary encoding of proofs, keys and other records
+
+This file contains a compact binary encoding for the tuples of EC points
+and scalars that make up proofs, key pairs and public keys, so they can be
+written to files or pipes and sent between processes.
+
+Every value of a record is encoded as a tag byte, "P" for a point and
+"S" for a scalar, followed by a length byte and the value itself.
+Points are encoded uncompressed, as decoding a compressed point requires
+a square root and is several hundred times slower.
+Scalars are encoded as a sign byte followed by the absolute value,
+since the response of the non-interactive proof of knowledge can be negative.
+In a stream every record is preceded by its length as a 4 byte integer.
+
+This file requires that the environment you are running on have the "petlib"
+library installed.
+
+The file contains the following functions:
+    - getGroup: returns the (cached) EC group with the given OpenSSL id
+    - encodePoint, decodePoint: encode and decode a single EC point
+    - encodeRecord: returns the encoding of a tuple of points and scalars
+    - decodeRecord: returns the tuple of points and scalars from an encoding
+    - splitRecord: splits an encoded record after its first values
+    - writeRecords: writes encoded records to a binary stream
+    - readRecords: reads encoded records from a binary stream
+"""
+
+from petlib import ec, bn
+import struct
+
+POINT_TAG = b"P"
+SCALAR_TAG = b"S"
+
+_groups = {}
+
+def getGroup(nid):
+    """Returns the EC group with the given OpenSSL id
+
+    Creating a group precomputes multiples of its generator,
+    so every group is only created once per process.
+
+    Args:
+        nid (int): the OpenSSL id of the curve
+
+    Returns:
+        group (EcGroup): the EC group
+    """
+
+    group = _groups.get(nid)
+    if group is None:
+        group = _groups[nid] = ec.EcGroup(nid)
+
+    return group
+
+def encodePoint(pt):
+    """Encodes a single EC point
+
+    Args:
+        pt (EcPt): the point
+
+    Returns:
+        (bytes): the uncompressed encoding of the point
+    """
+
+    return pt.export(ec.POINT_CONVERSION_UNCOMPRESSED)
+
+def decodePoint(group, data):
+    """Decodes a single EC point
+
+    Args:
+        group (EcGroup): the EC group the point belongs to
+        data (bytes): the encoding of the point
+
+    Returns:
+        (EcPt): the point
+
+    Raises:
+        ValueError: if the data is not the encoding of a point of the group
+    """
+
+    #petlib raises a bare Exception for any encoding OpenSSL rejects
+    try:
+        return ec.EcPt.from_binary(bytes(data), group)
+    except Exception:
+        raise ValueError("invalid point") from None
+
+def _encodeScalar(x):
+    #Scalars can be Bn or int, the sign is kept in a separate byte
+    x = int(x)
+    sign = b"\x01" if x < 0 else b"\x00"
+    x = abs(x)
+
+    return sign + x.to_bytes((x.bit_length() + 7) // 8, "big")
+
+def _decodeScalar(data):
+    x = bn.Bn.from_binary(bytes(data[1:]))
+    if data[0] == 1:
+        x = -x
+
+    return x
+
+def encodeRecord(values):
+    """Encodes a tuple of EC points and scalars
+
+    Args:
+        values (tuple of EcPt, Bn or int): e.g. a proof or a key pair
+
+    Returns:
+        (bytes): the encoding of the record
+    """
+
+    parts = []
+    for value in values:
+        if isinstance(value, ec.EcPt):
+            tag, data = POINT_TAG, encodePoint(value)
+        else:
+            tag, data = SCALAR_TAG, _encodeScalar(value)
+        parts.append(tag + bytes((len(data),)) + data)
+
+    return b"".join(parts)
+
+def decodeRecord(group, data):
+    """Decodes a tuple of EC points and scalars
+
+    Args:
+        group (EcGroup): the EC group the points belong to
+        data (bytes): the encoding of the record
+
+    Returns:
+        (tuple of EcPt and Bn): the decoded record
+
+    Raises:
+        ValueError: if the encoding is malformed
+    """
+
+    values = []
+    i = 0
+    while i < len(data):
+        if i + 2 > len(data):
+            raise ValueError("truncated record")
+
+        tag, length = data[i:i+1], data[i+1]
+        value = data[i+2:i+2+length]
+        if len(value) != length:
+            raise ValueError("truncated record")
+
+        if tag == POINT_TAG:
+            values.append(decodePoint(group, value))
+        elif tag == SCALAR_TAG and length > 0:
+            values.append(_decodeScalar(value))
+        else:
+            raise ValueError("unknown value in record")
+
+        i += 2 + length
+
+    return tuple(values)
+
+def splitRecord(data, count):
+    """Splits an encoded record after its first values, without decoding them
+
+    Args:
+        data (bytes): the encoding of the record
+        count (int): the number of values in the first part
+
+    Returns:
+        head (bytes): the encoding of the first count values
+        tail (bytes): the encoding of the remaining values
+
+    Raises:
+        ValueError: if the record has fewer than count values
+    """
+
+    i = 0
+    for _ in range(count):
+        if i + 2 > len(data) or i + 2 + data[i+1] > len(data):
+            raise ValueError("truncated record")
+        i += 2 + data[i+1]
+
+    return data[:i], data[i:]
+
+def writeRecords(stream, records):
+    """Writes encoded records to a binary stream
+
+    Args:
+        stream (binary file): the stream to write to
+        records (iterable of bytes): the encoded records
+
+    Returns:
+        count (int): the number of records written
+    """
+
+    count = 0
+    for record in records:
+        stream.write(struct.pack(">I", len(record)))
+        stream.write(record)
+        count += 1
+
+    return count
+
+def readRecords(stream):
+    """Reads encoded records from a binary stream
+
+    Args:
+        stream (binary file): the stream to read from
+
+    Returns:
+        (generator of bytes): the encoded records, in the order they were written
+
+    Raises:
+        ValueError: if the stream ends in the middle of a record
+    """
+
+    while True:
+        header = stream.read(4)
+        if not header:
+            return
+        if len(header) != 4:
+            raise ValueError("truncated record length")
+
+        length, = struct.unpack(">I", header)
+        record = stream.read(length)
+        if len(record) != length:
+            raise ValueError("truncated record")
+
+        yield record
@@ -0,0 +1,58 @@
+"""Cached group generators
+
+This file contains a cache for the group generators created with the
+"zksk" library method "make_generators". Creating a generator hashes to a
+point on the curve, which takes about a millisecond per generator,
+so the generators are only created once per EC group and process.
+
+make_generators derives the i'th generator from the index i alone,
+so the first n generators are the same for any number of generators,
+and a request for more generators than are cached replaces the cache.
+
+This file requires that the environment you are running on have the "ZKSK"
+library installed.
+
+The file contains the following functions:
+    - getGenerators: returns the first n generators of the EC group
+    - setGenerators: adds generators computed elsewhere to the cache
+"""
+
+from zksk.utils.groups import make_generators
+
+_generators = {}
+
+def getGenerators(n, group):
+    """Returns the first n generators of the EC group
+
+    Args:
+        n (int): the number of generators
+        group (EcGroup): the EC group from an EC over a finite field
+
+    Returns:
+        (list of EcPt): n different generators of the group
+    """
+
+    nid = group.nid()
+    generators = _generators.get(nid, [])
+    if len(generators) < n:
+        generators = _generators[nid] = make_generators(n, group)
+
+    return generators[:n]
+
+def setGenerators(generators, group):
+    """Adds generators computed elsewhere to the cache
+
+    Used by worker processes that read the generators from a shared table.
+    The generators must be the first generators of make_generators, in order.
+
+    Args:
+        generators (list of EcPt): the first generators of the group
+        group (EcGroup): the EC group from an EC over a finite field
+
+    Returns:
+        None
+    """
+
+    nid = group.nid()
+    if len(generators) > len(_generators.get(nid, [])):
+        _generators[nid] = list(generators)
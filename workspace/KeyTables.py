@@ -0,0 +1,349 @@
+"""Adaptive precomputation for frequently used public keys
+
+This file contains a cache of precomputed values for the public keys,
+the statements h or (h1, h2), that are used most often. A few keys usually
+account for most of the proofs to verify, and for these keys the work
+that only depends on the key is done once instead of for every proof:
+
+    - decoding the key from its encoding
+    - checking that the key is on the curve
+    - the part of the Fiat-Shamir transcript that only depends on the
+      bases and the key, e.g. the sum g+h of the non-interactive proof of
+      knowledge, or the hash state after the encoding of h
+
+How often every key is used is counted when keys are decoded with
+decodeStatement, and a key gets a table once it has been used HOT_USES
+times. The tables are kept under a memory cap, and when the cap is reached
+the least frequently used table is evicted, but only for a key that has been
+used more often than that table, so a full cache is not churned by keys that
+are hot for a moment. The counts of the keys without a table are halved when
+too many keys are counted, and the counts of all keys, with or without a
+table, are halved every AGE_USES decoded keys, so keys that were only used
+for a while are forgotten and newly hot keys can take over their tables.
+
+The verification in SigmaProtocol.py looks the statement up by the identity
+of its points, so any statement returned by decodeStatement uses its table
+without changes to the callers, and statements without a table are
+verified as before.
+
+The scalar multiplication e*h itself is not precomputed: OpenSSL computes
+the multiplications of a verification in one native call, which is faster
+than combining a windowed table of multiples of h with point additions
+from Python, and petlib has no way to hand a precomputed table to OpenSSL.
+
+The tables are kept per process, so worker processes have to send their
+counters back to be combined with the merge function.
+
+This file requires that the environment you are running on have the "petlib"
+library installed.
+
+The file contains the following functions:
+    - decodeStatement: returns the decoded public keys, from the table if the keys have one
+    - isValid: returns whether the points of a statement with a table are on the curve
+    - memo: returns a value precomputed for a statement, computed once per table
+    - setMemoryCap: sets the memory cap of the tables
+    - getStats: returns the hit rate and the memory of the tables
+    - merge: adds counters from another process to the counters of this process
+    - resetStats: sets all counters to zero, the tables are kept
+    - resetTables: removes all tables and counters
+    - formatStats: returns the counters as printable lines
+"""
+
+from petlib import ec
+import Encoding
+
+HOT_USES = 4
+MEMORY_CAP = 16 * 2**20
+COUNT_LIMIT = 2**16
+AGE_USES = 2**16
+
+#Estimated memory of a point, including the OpenSSL point, and of a table
+#without its points, measured on P-224
+POINT_BYTES = 440
+TABLE_BYTES = 400
+
+def _emptyStats():
+    return {"hits": 0, "misses": 0, "built": 0, "evicted": 0}
+
+_tables = {}
+_byPoint = {}
+_counts = {}
+_frequencies = {}
+_memory = 0
+_decoded = 0
+_stats = _emptyStats()
+
+def _insert(key, table):
+    #Adds a table to the frequency list of its number of uses
+    _frequencies.setdefault(table["uses"], {})[key] = None
+
+def _remove(key, table):
+    keys = _frequencies[table["uses"]]
+    del keys[key]
+    if not keys:
+        del _frequencies[table["uses"]]
+
+def _evict():
+    #Removes the least frequently used tables, the oldest one first
+    #among tables used equally often, until the tables fit under the cap
+    global _memory
+
+    while _memory > MEMORY_CAP and _tables:
+        uses = min(_frequencies)
+        key = next(iter(_frequencies[uses]))
+        table = _tables.pop(key)
+        _remove(key, table)
+        del _byPoint[id(table["points"][0])]
+        _memory -= table["bytes"]
+        _stats["evicted"] += 1
+
+def _admit(uses, size):
+    #Whether a key used uses times gets a table of size bytes, a full cache
+    #only takes keys used more often than the table that would be evicted
+    return _memory + size <= MEMORY_CAP or not _frequencies or uses > min(_frequencies)
+
+def _build(key, group, points, uses):
+    #Precomputes the values of a key that has been used HOT_USES times
+    global _memory
+
+    table = {
+        "points": points,
+        "uses": uses,
+        "valid": all(group.check_point(pt) for pt in points),
+        "memo": {},
+        "bytes": _tableBytes(points),
+    }
+    _tables[key] = table
+    _byPoint[id(points[0])] = table
+    _insert(key, table)
+    _memory += table["bytes"]
+    _stats["built"] += 1
+
+    _evict()
+
+def _tableBytes(points):
+    return TABLE_BYTES + POINT_BYTES*len(points)
+
+def _age():
+    #Halves the counts of the keys without a table and forgets the rarely used keys
+    global _counts
+    _counts = {key: uses // 2 for key, uses in _counts.items() if uses > 1}
+
+def _ageTables():
+    #Halves the uses of the tables, keeping the oldest table first among
+    #tables used equally often
+    aged = [(key, _tables[key]) for uses in sorted(_frequencies) for key in _frequencies[uses]]
+    _frequencies.clear()
+    for key, table in aged:
+        table["uses"] = max(table["uses"] // 2, 1)
+        _insert(key, table)
+
+def decodeStatement(group, data):
+    """Returns the decoded public keys, from the table if the keys have one
+
+    Every call counts a use of the keys, and the keys get a table
+    once they have been used HOT_USES times, and more often than the
+    table evicted for them if the cache is full.
+
+    Args:
+        group (EcGroup): the EC group the points belong to
+        data (bytes): the encoding of the public keys, as by Encoding.encodeRecord
+
+    Returns:
+        (tuple of EcPt): the public keys, the same objects for every
+                         call while the keys have a table
+
+    Raises:
+        ValueError: if the encoding is malformed
+    """
+
+    global _decoded
+    _decoded += 1
+    if _decoded >= AGE_USES:
+        _decoded = 0
+        _age()
+        _ageTables()
+
+    key = (group.nid(), bytes(data))
+    table = _tables.get(key)
+    if table is not None:
+        _stats["hits"] += 1
+        _remove(key, table)
+        table["uses"] += 1
+        _insert(key, table)
+        return table["points"]
+
+    _stats["misses"] += 1
+    points = Encoding.decodeRecord(group, data)
+    if not points or not all(isinstance(pt, ec.EcPt) for pt in points):
+        return points
+
+    uses = _counts.get(key, 0) + 1
+    if uses >= HOT_USES and _admit(uses, _tableBytes(points)):
+        _counts.pop(key, None)
+        _build(key, group, points, uses)
+    else:
+        _counts[key] = uses
+        if len(_counts) > COUNT_LIMIT:
+            _age()
+
+    return points
+
+def _find(statement):
+    #The table of a statement returned by decodeStatement, None for other statements
+    if not statement:
+        return None
+
+    table = _byPoint.get(id(statement[0]))
+    if table is None:
+        return None
+
+    points = table["points"]
+    if len(points) != len(statement) or any(a is not b for a, b in zip(points, statement)):
+        return None
+
+    return table
+
+def isValid(statement):
+    """Returns whether the points of a statement with a table are on the curve
+
+    Args:
+        statement (tuple of EcPt): the public keys
+
+    Returns:
+        (bool): whether the points are on the curve,
+                None if the statement has no table
+    """
+
+    table = _find(statement)
+
+    return None if table is None else table["valid"]
+
+def memo(statement, owner, function):
+    """Returns a value precomputed for a statement, computed once per table
+
+    Args:
+        statement (tuple of EcPt): the public keys
+        owner (object): what the value belongs to besides the statement,
+                        e.g. the relation, kept alive with the value
+        function (function): computes the value, called without arguments
+
+    Returns:
+        the value of function, from the table if the statement has one
+    """
+
+    global _memory
+
+    table = _find(statement)
+    if table is None:
+        return function()
+
+    stored = table["memo"].get(id(owner))
+    if stored is None or stored[0] is not owner:
+        stored = table["memo"][id(owner)] = (owner, function())
+        table["bytes"] += POINT_BYTES
+        _memory += POINT_BYTES
+        _evict()
+
+    return stored[1]
+
+def setMemoryCap(cap):
+    """Sets the memory cap of the tables, evicting tables above the cap
+
+    Args:
+        cap (int): the memory cap in bytes
+
+    Returns:
+        None
+    """
+
+    global MEMORY_CAP
+    MEMORY_CAP = cap
+    _evict()
+
+def getStats():
+    """Returns the hit rate and the memory of the tables
+
+    No args
+
+    Returns:
+        (dict): the number of decoded keys that had a table (hits) and that
+                did not (misses), the hit rate, the number of tables built
+                and evicted, the number of tables and their memory in bytes
+    """
+
+    stats = dict(_stats)
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+    stats["tables"] = len(_tables)
+    stats["memory"] = _memory
+
+    return stats
+
+def merge(stats):
+    """Adds counters from another process to the counters of this process
+
+    Only the counters are added, the tables stay in the process that built them.
+
+    Args:
+        stats (dict): counters as returned by getStats
+
+    Returns:
+        None
+    """
+
+    for name in _stats:
+        _stats[name] += stats[name]
+
+def resetStats():
+    """Sets all counters to zero, the tables are kept
+
+    No args
+
+    Returns:
+        None
+    """
+
+    global _stats
+    _stats = _emptyStats()
+
+def resetTables():
+    """Removes all tables and counters
+
+    No args
+
+    Returns:
+        None
+    """
+
+    global _memory, _decoded, _stats
+    _tables.clear()
+    _byPoint.clear()
+    _counts.clear()
+    _frequencies.clear()
+    _memory = 0
+    _decoded = 0
+    _stats = _emptyStats()
+
+def formatStats(stats=None):
+    """Returns the counters as printable lines
+
+    Args:
+        stats (dict): counters as returned by getStats,
+                      the counters of this process if None
+
+    Returns:
+        (str): the hit rate, the tables and their memory
+    """
+
+    if stats is None:
+        stats = getStats()
+
+    return "\n".join([
+        "%-14s %12d" % ("key hits", stats["hits"]),
+        "%-14s %12d" % ("key misses", stats["misses"]),
+        "%-14s %12.1f" % ("hit rate (%)", 100 * stats["hit_rate"]),
+        "%-14s %12d" % ("tables", stats["tables"]),
+        "%-14s %12d" % ("evicted", stats["evicted"]),
+        "%-14s %12.1f" % ("memory (KiB)", stats["memory"] / 1024),
+    ])
@@ -8,6 +8,9 @@ non-interactive version using the Fiat-Shamir heuristic.
 This file consists of functions that together can be used to run
 a full non-interactive proof of knowledge.
 
+The step functions, proofGen, proofGen_batch and verify run the generic
+Sigma-protocol of SigmaProtocol.py for the relation h1 = w*g1 and h2 = w*g2.
+
 This file requires that the environment you are running on have the "petlib", "ZKSK"
 and "hashlib" libraries installed.
 
@@ -17,8 +20,11 @@ The file contains the following functions:
     - Prover_commitment: returns the two commitments and prover randomness
     - Prover_challenge: returns the challenge
     - Prover_response: returns the response
+    - getRelation: returns the Sigma-protocol relation of the proof
     - proofGen: returns the generated proof consisting of
                 commitments and response
+    - proofGen_batch: returns a stream of encoded proofs for a batch,
+                      optionally generated by a pool of worker processes
     - verify: returns True or False depending on whether the
               proof was accepted
 
@@ -29,8 +35,12 @@ These are commented out, but are kept in the file for documentation purposes.
 """
 
 from petlib import ec, bn
-from zksk.utils.groups import make_generators
 from hashlib import sha256
+import DeterministicNonce
+import Generators
+import KeyTables
+import Parallel
+import SigmaProtocol
 import time
 
 def groupGen():
@@ -48,8 +58,8 @@ def groupGen():
     q = group.order()
 
     #using the "zksk" library method for getting two different
-    #generators for the same EC group
-    g1, g2 = make_generators(2, group)
+    #generators for the same EC group, cached between calls
+    g1, g2 = Generators.getGenerators(2, group)
 
     return group, q, g1, g2
 
@@ -71,12 +81,13 @@ def keyGen(q, g1, g2):
 
     return w, h1, h2
 
-def Prover_commitment(q, g1, g2):
+def Prover_commitment(q, g1, g2, r=None):
     """Generates a two Prover commitments (step one in protocol)
 
     Args:
         q (Bn): the group order
         g1, g2 (EcPt): the two group generators
+        r (Bn): randomness to commit to, drawn at random if None
 
     Returns:
         a1, a2 (EcPt): the two Prover commitments to randomness r
@@ -84,11 +95,9 @@ def Prover_commitment(q, g1, g2):
         
     """
 
-    r = q.random()
-    a1 = r*g1
-    a2 = r*g2
+    (a1, a2), r = SigmaProtocol.Prover_commitment(getRelation(g1.group, g1, g2), None if r is None else (r,))
 
-    return a1, a2 , r
+    return a1, a2, r[0]
 
 def Prover_challenge(g1, g2, h1, h2, a1, a2):
     """Generates a Prover challenge (step two in protocol)
@@ -106,9 +115,9 @@ def Prover_challenge(g1, g2, h1, h2, a1, a2):
         
     """
 
-    #hashing the values together and outputting the hex value
-    #using the publicly agreed upon hashing function and values
-    e = sha256(str(g1+g2+h1+h2+a1+a2).encode()).hexdigest()
+    #hashing the values together using the publicly agreed upon
+    #hashing function and values, and outputting the hex value
+    e = "%064x" % SigmaProtocol.Prover_challenge(getRelation(g1.group, g1, g2), (h1, h2), (a1, a2))
 
     return e
 
@@ -128,11 +137,39 @@ def Prover_response(r, e, w, q):
 
     #Converting the challenge hex value to a Bn to include
     #in the computation of z
-    z = r + bn.Bn.from_hex(e)*w % q
+    z, = SigmaProtocol.computeResponses(q, (r,), bn.Bn.from_hex(e), (w,))
 
     return z
 
-def proofGen(q, g1, g2, h1, h2, w):
+def _transcript(relation, statement, commitments):
+    #The challenge of Prover_challenge as a Bn, the hash of the sum g1+g2+h1+h2+a1+a2
+    #The sum of the bases and the statement is kept in KeyTables for frequently used keys
+    group = relation.group
+    prefix = KeyTables.memo(statement, relation, lambda: group.sum(relation.bases + tuple(statement)))
+    total = group.sum((prefix,) + tuple(commitments))
+
+    return bn.Bn.from_binary(sha256(str(total).encode()).digest())
+
+def getRelation(group, g1, g2):
+    """Returns the Sigma-protocol relation h1 = w*g1 and h2 = w*g2 of the proof
+
+    The relation is what the functions of the file run on SigmaProtocol.py,
+    e.g. for verifyBatch or the audit of transcripts.
+
+    Args:
+        group (EcGroup): the EC group from an EC over a finite field
+        g1 (EcPt): the first group generator
+        g2 (EcPt): the second group generator
+
+    Returns:
+        relation (Relation): the cached relation of SigmaProtocol.getRelation
+    """
+
+    #The proof of equality is the Sigma-protocol for the relation
+    #h1 = w*g1 and h2 = w*g2, with the challenge of Prover_challenge
+    return SigmaProtocol.getRelation(group, [[g1], [g2]], transcript=_transcript)
+
+def proofGen(q, g1, g2, h1, h2, w, seed=None):
     """Generates the full proof
     commitment, challenge and response
 
@@ -141,6 +178,8 @@ def proofGen(q, g1, g2, h1, h2, w):
         g1, g2 (EcPt): the two group generators
         h1, h2 (EcPt): the two Prover public keys
         w (Bn): the Prover witness
+        seed (bytes): if given, r is derived deterministically from
+                      the witness, statement and seed instead of drawn at random
         
 
     Returns:
@@ -148,18 +187,44 @@ def proofGen(q, g1, g2, h1, h2, w):
         z (Bn): the Prover response 
     """
     
-    #Prover generates commitment
-    commitment1, commitment2, r = Prover_commitment(q, g1, g2)
-
-    #Prover generates challenge
-    challenge = Prover_challenge(g1, g2, h1, h2, commitment1, commitment2)
+    #With a seed the randomness is derived deterministically,
+    #otherwise it is drawn at random in the commitment step
+    r = None
+    if seed is not None:
+        r = DeterministicNonce.deriveNonce(q, w, (g1, g2, h1, h2), seed)
 
-    #Prover generates response.
-    response = Prover_response(r, challenge, w, q)
+    #Prover generates commitments, challenge and response, as in the
+    #generic Sigma-protocol for the relation h1 = w*g1 and h2 = w*g2
+    (commitment1, commitment2), responses = SigmaProtocol.proofGenNI(
+        getRelation(g1.group, g1, g2), (w,), (h1, h2), None if r is None else (r,))
 
     #Prover "sends" generated proof (commitments and response)
     #to Verifier for verification
-    return commitment1, commitment2, response
+    return commitment1, commitment2, responses[0]
+
+def proofGen_batch(q, g1, g2, keys, seed=None, workers=None, chunk_size=Parallel.DEFAULT_CHUNK_SIZE):
+    """Generates the full proofs for a batch of key sets
+
+    Args:
+        q (Bn): the group order
+        g1, g2 (EcPt): the two group generators
+        keys (iterable of (Bn, EcPt, EcPt)): the Prover witnesses and
+                                             the two public keys of each witness
+        seed (bytes): if given, the randomness of the i'th proof is derived
+                      deterministically as in proofGen with the seed
+                      seed + i.to_bytes(8, "big")
+        workers (int): the number of worker processes, if None or 1
+                       the proofs are generated in the current process
+        chunk_size (int): the number of proofs handed to a worker at a time
+
+    Returns:
+        (generator of bytes): the encoded proofs (commitments and response),
+                              in the order of the keys
+    """
+
+    keys = (((w,), (h1, h2)) for w, h1, h2 in keys)
+
+    return SigmaProtocol.proofGen_batch(getRelation(g1.group, g1, g2), keys, False, seed, workers, chunk_size)
 
 def verify(group, g1, g2, h1, h2, proof):
     """Verifies the full proof received from the prover
@@ -174,24 +239,17 @@ def verify(group, g1, g2, h1, h2, proof):
         (bool) : returns true only if all checks are accepted, else false 
     """
 
+    #Proofs with the wrong number of values are rejected before unpacking
+    if not SigmaProtocol.wellFormed(proof, 3):
+        return False
+
     a1, a2, z = proof
 
-    #Verifier generates the challenge
-    #using the publicly agreed upon hashing function and values
-    e = sha256(str(g1+g2+h1+h2+a1+a2).encode()).hexdigest()
-    
-    #Verifies that the reponse corresponds with the commitments
-    v1 = z*g1 == a1+bn.Bn.from_hex(e)*h1 #Verifies that the reponse corresponds with the commitment
-    v2 = z*g2 == a2 + bn.Bn.from_hex(e) * h2
-    
-    #Checks that the generators and public keys are on the curve
-    v_g1 = group.check_point(g1)
-    v_h1 = group.check_point(h1)
-    v_g2 = group.check_point(g2)
-    v_h2 = group.check_point(h2)
-
-    #All checks should be True for the proof to be accepted
-    return v1 & v2 & v_g1 & v_g2 & v_h1 & v_h2
+    #Verifier generates the challenge using the publicly agreed upon
+    #hashing function and values, checks that the generators and public keys
+    #are on the curve and that the reponse corresponds with the commitments,
+    #z*g1 == a1+e*h1 and z*g2 == a2+e*h2
+    return SigmaProtocol.verifyNI(getRelation(group, g1, g2), (h1, h2), (a1, a2), (z,))
 
 
 """#Generation of public knowledge
@@ -8,6 +8,34 @@ non-interactive version using the Fiat-Shamir heuristic.
 This file consists of functions that together can be used to run
 a full non-interactive proof of knowledge.
 
+The step functions, proofGen, proofGen_batch and verify run the generic
+Sigma-protocol of SigmaProtocol.py for the relation h = w*g.
+
+The file also contains a compact mode, where the proof consists of the
+challenge and the response (e, z) instead of the commitment and the
+response (a, z), and the challenge is the sha256 hash truncated to
+CHALLENGE_BITS = 128 bits. The Verifier recomputes the commitment as
+a = z*g + e*h and accepts if hashing it gives back e.
+    - The proof is 16 bytes for e instead of a full point for a.
+    - e*h is a multiplication with a 128 bit scalar instead of a 256 bit one,
+      however OpenSSL multiplies in constant time over the bit length of the
+      group order, so with petlib this does not make verification faster
+      (see benchmark.py).
+    - Security: the Prover can only cheat by guessing the challenge, which
+      succeeds with probability 2^-128 per hash evaluation. This is above
+      the about 2^112 operations needed to compute discrete logarithms on
+      the default curve (NIST P-224), so the short challenge does not lower
+      the security level. This is the argument for short Schnorr signatures
+      by Neven, Smart and Warinschi. A 128 bit challenge must not be used
+      with curves aiming for more than 128 bit security.
+    - The challenge hashes the encodings of g, h and a, not their sum as
+      Prover_challenge does, so the statement is bound to the proof.
+    - Proofs of the (e, z) form can not be checked with randomized batch
+      verification, which needs the commitments.
+    - With a seed, the nonce is derived in its own domain, as a proof of
+      each form with the same nonce would give the witness away.
+Compact proofs are not compatible with proofs of the (a, z) form.
+
 This file requires that the environment you are running on have the "petlib"
 and "hashlib" libraries installed.
 
@@ -17,10 +45,18 @@ The file contains the following functions:
     - Prover_commitment: returns the commitment and prover randomness
     - Prover_challenge: returns the challenge
     - Prover_response: returns the response
+    - getRelation: returns the Sigma-protocol relation of the proof
     - proofGen: returns the generated proof consisting of
                 commitment and response
+    - proofGen_batch: returns a stream of encoded proofs for a batch,
+                      optionally generated by a pool of worker processes
     - verify: returns True or False depending on whether the
               proof was accepted
+    - Prover_challenge_short: returns the truncated challenge of the compact mode
+    - proofGen_short: returns the compact proof consisting of
+                      challenge and response
+    - verify_short: returns True or False depending on whether the
+                    compact proof was accepted
 
 At the end of the file some examples of how to run a full non-interactive
 proof of knowledge as well as how the time taking is done for
@@ -30,8 +66,19 @@ These are commented out, but are kept in the file for documentation purposes.
 
 from petlib import ec, bn
 from hashlib import sha256
+import DeterministicNonce
+import KeyTables
+import Parallel
+import SigmaProtocol
+import VerifyStats
 import time
 
+CHALLENGE_BITS = 128
+
+#The domain of the nonces of the compact mode, so a seed used for both
+#forms does not give the same nonce with two different challenges
+SHORT_DOMAIN = b"NIPoK-short"
+
 def groupGen():
     """Generates an EC group, group order and generator
 
@@ -66,12 +113,13 @@ def keyGen(q, g):
     
     return w, h
 
-def Prover_commitment(q, g):
+def Prover_commitment(q, g, r=None):
     """Generates a Prover commitment (step one in protocol)
 
     Args:
         q (Bn): the group order
         g (EcPt): the group generator
+        r (Bn): randomness to commit to, drawn at random if None
 
     Returns:
         a (EcPt): the Prover commitment to randomness r
@@ -79,10 +127,9 @@ def Prover_commitment(q, g):
         
     """
 
-    r = q.random()
-    a = r*g
+    commitments, r = SigmaProtocol.Prover_commitment(getRelation(g.group, g), None if r is None else (r,))
 
-    return a, r
+    return commitments[0], r[0]
 
 def Prover_challenge(g, h, a):
     """Generates a Prover challenge (step two in protocol)
@@ -99,9 +146,9 @@ def Prover_challenge(g, h, a):
         
     """
 
-    #hashing the values together and outputting the hex value
-    #using the publicly agreed upon hashing function and values
-    e = sha256(str(g+h+a).encode()).hexdigest()
+    #hashing the values together using the publicly agreed upon
+    #hashing function and values, and outputting the hex value
+    e = "%064x" % SigmaProtocol.Prover_challenge(getRelation(g.group, g), (h,), (a,))
 
     return e
 
@@ -121,11 +168,38 @@ def Prover_response(r, e, w, q):
 
     #Converting the challenge hex value to a Bn to include
     #in the computation of z
-    z = r - bn.Bn.from_hex(e)*w % q
+    z, = SigmaProtocol.computeResponses(q, (r,), bn.Bn.from_hex(e), (w,), -1)
 
     return z
 
-def proofGen(q, g, w, h):
+def _transcript(relation, statement, commitments):
+    #The challenge of Prover_challenge as a Bn, the hash of the sum g+h+a
+    #The sum of the bases and the statement is kept in KeyTables for frequently used keys
+    group = relation.group
+    prefix = KeyTables.memo(statement, relation, lambda: group.sum(relation.bases + tuple(statement)))
+    total = group.sum((prefix,) + tuple(commitments))
+
+    return bn.Bn.from_binary(sha256(str(total).encode()).digest())
+
+def getRelation(group, g):
+    """Returns the Sigma-protocol relation h = w*g of the proof
+
+    The relation is what the functions of the file run on SigmaProtocol.py,
+    e.g. for verifyBatch or the audit of transcripts.
+
+    Args:
+        group (EcGroup): the EC group from an EC over a finite field
+        g (EcPt): the group generator
+
+    Returns:
+        relation (Relation): the cached relation of SigmaProtocol.getRelation
+    """
+
+    #The proof of knowledge is the Sigma-protocol for the relation h = w*g,
+    #with the response z = r - e*w and the challenge of Prover_challenge
+    return SigmaProtocol.getRelation(group, [[g]], sign=-1, transcript=_transcript)
+
+def proofGen(q, g, w, h, seed=None):
     """Generates the full proof
     commitment, challenge and response
 
@@ -134,6 +208,8 @@ def proofGen(q, g, w, h):
         g (EcPt): the group generator
         w (Bn): the Prover witness
         h (EcPt): the Prover public key
+        seed (bytes): if given, r is derived deterministically from
+                      the witness, statement and seed instead of drawn at random
         
 
     Returns:
@@ -141,18 +217,43 @@ def proofGen(q, g, w, h):
         z (Bn): the Prover response 
     """
 
-    #Prover generates commitment
-    commitment, r = Prover_commitment(q, g)
-
-    #Prover generates challenge
-    challenge = Prover_challenge(g,h,commitment)
+    #With a seed the randomness is derived deterministically,
+    #otherwise it is drawn at random in the commitment step
+    r = None
+    if seed is not None:
+        r = DeterministicNonce.deriveNonce(q, w, (g, h), seed)
 
-    #Prover generates response.
-    response = Prover_response(r, challenge, w, q)
+    #Prover generates commitment, challenge and response,
+    #as in the generic Sigma-protocol for the relation h = w*g
+    commitments, responses = SigmaProtocol.proofGenNI(
+        getRelation(g.group, g), (w,), (h,), None if r is None else (r,))
 
     #Prover "sends" generated proof (commitment and response)
     #to Verifier for verification
-    return commitment, response
+    return commitments[0], responses[0]
+
+def proofGen_batch(q, g, keys, seed=None, workers=None, chunk_size=Parallel.DEFAULT_CHUNK_SIZE):
+    """Generates the full proofs for a batch of key pairs
+
+    Args:
+        q (Bn): the group order
+        g (EcPt): the group generator
+        keys (iterable of (Bn, EcPt)): the Prover witnesses and public keys
+        seed (bytes): if given, the randomness of the i'th proof is derived
+                      deterministically as in proofGen with the seed
+                      seed + i.to_bytes(8, "big")
+        workers (int): the number of worker processes, if None or 1
+                       the proofs are generated in the current process
+        chunk_size (int): the number of proofs handed to a worker at a time
+
+    Returns:
+        (generator of bytes): the encoded proofs (commitment and response),
+                              in the order of the keys
+    """
+
+    keys = (((w,), (h,)) for w, h in keys)
+
+    return SigmaProtocol.proofGen_batch(getRelation(g.group, g), keys, False, seed, workers, chunk_size)
 
 def verify(group, g, h, proof):
     """Verifies the full proof received from the prover
@@ -167,21 +268,115 @@ def verify(group, g, h, proof):
         (bool) : returns true only if all checks are accepted, else false 
     """
 
+    #Proofs with the wrong number of values are rejected before unpacking
+    if not SigmaProtocol.wellFormed(proof, 2):
+        return False
+
     a, z = proof
 
-    #Verifier generates the challenge
-    #using the publicly agreed upon hashing function and values
-    e = sha256(str(g+h+a).encode()).hexdigest()
+    #Verifier generates the challenge using the publicly agreed upon
+    #hashing function and values, checks that g and h are on the curve and
+    #that the reponse corresponds with the commitment, a == z*g+e*h
+    return SigmaProtocol.verifyNI(getRelation(group, g), (h,), (a,), (z,))
 
-    #Verifies that the reponse corresponds with the commitment
-    v = a == z*g+bn.Bn.from_hex(e)*h
+
+def Prover_challenge_short(g, h, a):
+    """Generates the truncated Prover challenge of the compact mode
+    The challenge is the first CHALLENGE_BITS bits of the hash of
+    the encodings of the public values, g and h, and the commitment, a.
+
+    Args:
+        g (EcPt): the group generator
+        h (EcPt): the Prover public key
+        a (EcPt): the Prover commitment to randomness r
+
+    Returns:
+        e (Bn): the prover challenge, less than 2^CHALLENGE_BITS
+
+    """
+
+    digest = sha256(g.export() + h.export() + a.export()).digest()
+    e = bn.Bn.from_binary(digest[:CHALLENGE_BITS // 8])
+
+    return e
+
+def proofGen_short(q, g, w, h, seed=None):
+    """Generates the full compact proof
+    commitment, challenge and response, of which the challenge and response are sent
+
+    Args:
+        q (Bn): the group order
+        g (EcPt): the group generator
+        w (Bn): the Prover witness
+        h (EcPt): the Prover public key
+        seed (bytes): if given, r is derived deterministically from
+                      the witness, statement and seed instead of drawn at random,
+                      different from the r of proofGen with the same seed
+
+    Returns:
+        e (Bn): the truncated Prover challenge
+        z (Bn): the Prover response
+    """
+
+    r = None
+    if seed is not None:
+        r = DeterministicNonce.deriveNonce(q, w, (g, h), seed, SHORT_DOMAIN)
+
+    #Prover generates commitment, truncated challenge and response,
+    #the response is the same as for the (a, z) form
+    commitment, r = Prover_commitment(q, g, r)
+    challenge = Prover_challenge_short(g, h, commitment)
+    response = r - challenge*w % q
+
+    #Prover "sends" the challenge and response to Verifier for verification,
+    #the commitment is recomputed by the Verifier
+    return challenge, response
+
+def verify_short(group, g, h, proof):
+    """Verifies the full compact proof received from the prover
+
+    The stages are counted in VerifyStats like for verify, but the commitment
+    has to be recomputed before the transcript can be hashed,
+    so the arithmetic stage comes before the transcript stage.
+
+    Args:
+        group (EcGroup): the EC group from an EC over a finite field
+        g (EcPt): the group generator
+        h (EcPt): the Prover public key
+        proof (Bn, Bn): challenge and response
+
+    Returns:
+        (bool) : returns true only if all checks are accepted, else false
+    """
+
+    if not SigmaProtocol.wellFormed(proof, 2):
+        return False
+
+    e, z = proof
+    start = VerifyStats.clock()
+
+    #The challenge has at most CHALLENGE_BITS bits and |z| < q
+    if (not isinstance(e, bn.Bn) or not isinstance(z, bn.Bn)
+            or e.num_bits() > CHALLENGE_BITS or z.num_bits() > group.order().num_bits()):
+        return VerifyStats.reject("decode", start)
+    start = VerifyStats.passed("decode", start)
 
     #Checks that g and h are on the curve
-    g_v = group.check_point(g)
-    g_h = group.check_point(h)
+    if not (group.check_point(g) and group.check_point(h)):
+        return VerifyStats.reject("points", start)
+    start = VerifyStats.passed("points", start)
+
+    #Verifier recomputes the commitment a = z*g + e*h
+    #with one multi-scalar multiplication, e has only CHALLENGE_BITS bits
+    a = group.wsum([z, e], [g, h])
+    start = VerifyStats.passed("arithmetic", start)
+
+    #Verifies that the challenge is the hash of the recomputed commitment
+    if Prover_challenge_short(g, h, a) != e:
+        return VerifyStats.reject("transcript", start)
+    VerifyStats.passed("transcript", start)
 
-    #All checks should be True for the proof to be accepted
-    return v & g_v & g_h
+    return VerifyStats.accept()
 
 
 """#Generation of public knowledge
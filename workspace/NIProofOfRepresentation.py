@@ -0,0 +1,237 @@
+"""Implementation of non-interactive elliptic curve proof of knowledge of a representation
+
+This file contains an elliptic curve implementation of the proof of
+knowledge of a representation, the generalisation of the proof of knowledge
+on page 1 in Ivan Damgård's paper "On Sigma-Protocols" to several witnesses,
+however modified to a non-interactive version using the Fiat-Shamir heuristic.
+The Prover shows knowledge of w1, ..., wn such that
+
+    h = w1*g1 + w2*g2 + ... + wn*gn
+
+e.g. the opening of a Pedersen commitment when n is 2.
+
+This file consists of functions that together can be used to run
+a full non-interactive proof of knowledge of a representation.
+
+proofGen and verify run the generic Sigma-protocol of SigmaProtocol.py,
+so the n+1 term verification equation is checked with one
+multi-scalar multiplication. Unlike the other non-interactive proofs
+of the project, the challenge hashes the encodings of every generator,
+the public key and the commitment, instead of their sum.
+
+This file requires that the environment you are running on have the "petlib", "ZKSK"
+and "hashlib" libraries installed.
+
+The file contains the following functions:
+    - groupGen: returns the EC group, group order, and n group generators
+    - keyGen: returns the key set consisting of n secrets and a public key
+    - Prover_commitment: returns the commitment and prover randomness
+    - Prover_challenge: returns the challenge
+    - Prover_response: returns the responses
+    - getRelation: returns the Sigma-protocol relation of the proof
+    - proofGen: returns the generated proof consisting of
+                commitment and responses
+    - verify: returns True or False depending on whether the
+              proof was accepted
+
+At the end of the file some examples of how to run a full non-interactive
+proof of knowledge of a representation as well as how the time taking is done for
+the analysis of the project.
+These are commented out, but are kept in the file for documentation purposes.
+"""
+
+from petlib import ec
+import DeterministicNonce
+import Generators
+import SigmaProtocol
+import time
+
+def groupGen(n):
+    """Generates an EC group, group order and n generators
+
+    Args:
+        n (int): the number of generators, one per witness
+
+    Returns:
+        group (EcGroup): the EC group from an EC over a finite field
+        q (Bn): the group order
+        generators (list of EcPt): n group generators
+    """
+
+    group = ec.EcGroup()
+    q = group.order()
+
+    #using the "zksk" library method for getting n different
+    #generators for the same EC group, cached between calls
+    generators = Generators.getGenerators(n, group)
+
+    return group, q, generators
+
+def keyGen(q, generators):
+    """Generates n secrets and a public key for Prover using the EC group
+
+    Args:
+        q (Bn): the group order
+        generators (list of EcPt): the n group generators
+
+    Returns:
+        w (tuple of Bn): the Prover secret keys, also called the witnesses
+        h (EcPt): the Prover public key
+    """
+
+    w = tuple(q.random() for _ in generators)
+    h, = SigmaProtocol.statement(getRelation(generators[0].group, generators), w)
+
+    return w, h
+
+def Prover_commitment(q, generators, r=None):
+    """Generates a Prover commitment (step one in protocol)
+
+    Args:
+        q (Bn): the group order
+        generators (list of EcPt): the n group generators
+        r (tuple of Bn): randomness to commit to, drawn at random if None
+
+    Returns:
+        a (EcPt): the Prover commitment to randomness r
+        r (tuple of Bn): randomness
+
+    """
+
+    commitments, r = SigmaProtocol.Prover_commitment(getRelation(generators[0].group, generators), r)
+
+    return commitments[0], r
+
+def Prover_challenge(generators, h, a):
+    """Generates a Prover challenge (step two in protocol)
+    For non-interactive proofs, the challenge is generated by
+    hashing together the public values, the generators and h, and the commitment, a.
+
+    Args:
+        generators (list of EcPt): the n group generators
+        h (EcPt): the Prover public key
+        a (EcPt): the Prover commitment to randomness r
+
+    Returns:
+        e (Bn): the prover challenge
+
+    """
+
+    e = SigmaProtocol.Prover_challenge(getRelation(generators[0].group, generators), (h,), (a,))
+
+    return e
+
+def Prover_response(r, e, w, q):
+    """Generates the Prover responses (step three in protocol)
+
+    Args:
+        r (tuple of Bn): randomness
+        e (Bn): Prover challenge
+        w (tuple of Bn): the Prover witnesses
+        q (Bn): the group order
+
+    Returns:
+        z (tuple of Bn): the Prover responses
+
+    """
+
+    z = SigmaProtocol.computeResponses(q, r, e, w)
+
+    return z
+
+def getRelation(group, generators):
+    """Returns the Sigma-protocol relation h = w1*g1 + ... + wn*gn of the proof
+
+    The relation is what the functions of the file run on SigmaProtocol.py,
+    e.g. for verifyBatch or the audit of transcripts.
+
+    Args:
+        group (EcGroup): the EC group from an EC over a finite field
+        generators (list of EcPt): the n group generators
+
+    Returns:
+        relation (Relation): the cached relation of SigmaProtocol.getRelation
+    """
+
+    #The proof of knowledge of a representation is the Sigma-protocol
+    #for the relation h = w1*g1 + ... + wn*gn
+    return SigmaProtocol.getRelation(group, [list(generators)])
+
+def proofGen(q, generators, w, h, seed=None):
+    """Generates the full proof
+    commitment, challenge and responses
+
+    Args:
+        q (Bn): the group order
+        generators (list of EcPt): the n group generators
+        w (tuple of Bn): the Prover witnesses
+        h (EcPt): the Prover public key
+        seed (bytes): if given, r is derived deterministically from
+                      the witnesses, statement and seed instead of drawn at random
+
+    Returns:
+        a (EcPt): the Prover commitment to randomness r
+        z (tuple of Bn): the Prover responses
+    """
+
+    #With a seed the randomness is derived deterministically,
+    #one nonce per witness, otherwise it is drawn at random in the commitment step
+    r = None
+    if seed is not None:
+        statement = list(generators) + [h]
+        r = tuple(DeterministicNonce.deriveNonces(q, w, [statement]*len(w), seed))
+
+    #Prover generates commitment, challenge and responses,
+    #as in the generic Sigma-protocol for the relation
+    commitments, responses = SigmaProtocol.proofGenNI(
+        getRelation(generators[0].group, generators), w, (h,), r)
+
+    #Prover "sends" generated proof (commitment and responses)
+    #to Verifier for verification
+    return commitments[0], responses
+
+def verify(group, generators, h, proof):
+    """Verifies the full proof received from the prover
+
+    Args:
+        group (EcGroup): the EC group from an EC over a finite field
+        generators (list of EcPt): the n group generators
+        h (EcPt): the Prover public key
+        proof (EcPt, tuple of Bn): commitment and responses
+
+    Returns:
+        (bool) : returns true only if all checks are accepted, else false
+    """
+
+    #Proofs with the wrong number of values are rejected before unpacking
+    if not SigmaProtocol.wellFormed(proof, 2):
+        return False
+
+    a, z = proof
+
+    #Verifier generates the challenge using the publicly agreed upon
+    #hashing function and values, checks that the generators and h are
+    #on the curve and that the responses correspond with the commitment,
+    #z1*g1 + ... + zn*gn - e*h == a
+    return SigmaProtocol.verifyNI(getRelation(group, generators), (h,), (a,), z)
+
+
+"""#Generation of public knowledge
+group, q, generators = groupGen(8)
+
+#Prover generates their secrets and public key, "publishing" the public key
+w, h = keyGen(q, generators)
+
+startProof = time.process_time_ns()
+#Prover generates proof
+proof = proofGen(q, generators, w, h)
+finishProof = time.process_time_ns() - startProof
+
+startVerify = time.process_time_ns()
+#Verifier "receives" proof and verifies it:
+v = verify(group, generators, h, proof)
+finishVerify = time.process_time_ns() - startVerify
+
+print("NIPoR Proof verified:", v)
+print("NIPoR Proof Generation time:", finishProof)
+print("NIPoR Proof Verification time:", finishVerify)"""
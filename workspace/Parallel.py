@@ -0,0 +1,116 @@
+"""Chunked and parallel execution of batch operations
+
+This file contains the helpers used by the batch functions of the protocols
+to split a large batch into chunks and process the chunks either in the
+current process or spread over a pool of worker processes.
+
+Results are returned as a stream in the same order as the input,
+and only a bounded number of chunks is in flight at any time,
+so batches larger than the available memory can be processed.
+
+The file contains the following functions:
+    - chunked: splits an iterable into lists of a given size
+    - mapChunks: applies a function to every chunk, optionally in parallel
+    - prefetch: reads an iterable ahead in a background thread
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+from itertools import islice
+from queue import Queue
+from threading import Thread
+
+DEFAULT_CHUNK_SIZE = 256
+
+def chunked(iterable, size=DEFAULT_CHUNK_SIZE):
+    """Splits an iterable into lists of a given size
+
+    Args:
+        iterable (iterable): the values to split
+        size (int): the number of values in every chunk but the last
+
+    Returns:
+        (generator of list): the chunks
+    """
+
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+def mapChunks(function, chunks, workers=None, initializer=None, initargs=()):
+    """Applies a function to every chunk, optionally in parallel
+
+    The function has to be defined at the top level of a module
+    and its arguments and results have to be picklable,
+    e.g. encoded points and scalars, when workers are used.
+
+    Args:
+        function (function): the function applied to every chunk
+        chunks (iterable): the chunks
+        workers (int): the number of worker processes,
+                       the chunks are processed in the current process if None or 1
+        initializer (function): called with initargs once in every worker
+                                process, or once in the current process
+        initargs (tuple): the arguments of the initializer
+
+    Returns:
+        (generator): the results of the function, in the order of the chunks
+    """
+
+    if not workers or workers <= 1:
+        if initializer is not None:
+            initializer(*initargs)
+        for chunk in chunks:
+            yield function(chunk)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=initializer, initargs=initargs) as pool:
+        #Keeping two chunks per worker in flight keeps all workers busy
+        #while results are consumed, without reading the whole input
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(function, chunk))
+            if len(pending) >= 2*workers:
+                yield pending.popleft().result()
+
+        while pending:
+            yield pending.popleft().result()
+
+def prefetch(iterable, depth=2):
+    """Reads an iterable ahead in a background thread
+
+    Used to read and split the input while the previous chunks are processed,
+    e.g. prefetch(chunked(records)). At most depth values are read ahead.
+
+    Args:
+        iterable (iterable): the values, e.g. chunks read from a file
+        depth (int): the number of values read ahead
+
+    Returns:
+        (generator): the values, in order, an exception raised while
+                     reading is raised when its position is reached
+    """
+
+    queue = Queue(depth)
+
+    def read():
+        try:
+            for value in iterable:
+                queue.put((True, value))
+        except Exception as error:
+            queue.put((False, error))
+            return
+        queue.put((False, None))
+
+    Thread(target=read, daemon=True).start()
+
+    while True:
+        ok, value = queue.get()
+        if not ok:
+            if value is not None:
+                raise value
+            return
+        yield value
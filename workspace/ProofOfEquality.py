@@ -7,6 +7,9 @@ in Ivan Damgård's paper "On Sigma-Protocols".
 This file consists of functions that together can be used to run
 a full proof of equality.
 
+The step functions, proofGen, proofGen_batch and verify run the generic
+Sigma-protocol of SigmaProtocol.py for the relation h1 = w*g1 and h2 = w*g2.
+
 This file requires that the environment you are running on have the "petlib" and "ZKSK"
 libraries installed.
 
@@ -16,8 +19,11 @@ The file contains the following functions:
     - Prover_commitment: returns the two commitments and prover randomness
     - Verifier_challenge: returns the challenge
     - Prover_response: returns the response
+    - getRelation: returns the Sigma-protocol relation of the proof
     - proofGen: returns the generated proof consisting of
                 commitment, challenge, response
+    - proofGen_batch: returns a stream of encoded proofs for a batch,
+                      optionally generated by a pool of worker processes
     - verify: returns True or False depending on whether the
               proof was accepted
 
@@ -27,7 +33,9 @@ These are commented out, but are kept in the file for documentation purposes.
 """
 
 from petlib import ec
-from zksk.utils.groups import make_generators
+import Generators
+import Parallel
+import SigmaProtocol
 import time
 
 def groupGen():
@@ -45,8 +53,8 @@ def groupGen():
     q = group.order()
 
     #using the "zksk" library method for getting two different
-    #generators for the same EC group
-    g1, g2 = make_generators(2, group)
+    #generators for the same EC group, cached between calls
+    g1, g2 = Generators.getGenerators(2, group)
 
     return group, q, g1, g2
 
@@ -68,12 +76,13 @@ def keygen(q, g1, g2):
     
     return w, h1, h2
 
-def Prover_commitment(q, g1, g2):
+def Prover_commitment(q, g1, g2, r=None):
     """Generates a two Prover commitments (step one in protocol)
 
     Args:
         q (Bn): the group order
         g1, g2 (EcPt): the two group generators
+        r (Bn): randomness to commit to, drawn at random if None
 
     Returns:
         a1, a2 (EcPt): the two Prover commitments to randomness r
@@ -81,11 +90,9 @@ def Prover_commitment(q, g1, g2):
         
     """
     
-    r = q.random()
-    a1 = r*g1
-    a2 = r*g2
-    
-    return a1, a2, r
+    (a1, a2), r = SigmaProtocol.Prover_commitment(getRelation(g1.group, g1, g2), None if r is None else (r,))
+
+    return a1, a2, r[0]
 
 def Verifier_challenge(q):
     """Generates a Verifier challenge (step two in protocol)
@@ -116,11 +123,30 @@ def Prover_response(r, e, w, q):
         
     """
 
-    z = r + e*w % q
+    z, = SigmaProtocol.computeResponses(q, (r,), e, (w,))
     
     return z
 
-def proofGen(q, g1, g2, w):
+def getRelation(group, g1, g2):
+    """Returns the Sigma-protocol relation h1 = w*g1 and h2 = w*g2 of the proof
+
+    The relation is what the functions of the file run on SigmaProtocol.py,
+    e.g. for verifyBatch or the audit of transcripts.
+
+    Args:
+        group (EcGroup): the EC group from an EC over a finite field
+        g1 (EcPt): the first group generator
+        g2 (EcPt): the second group generator
+
+    Returns:
+        relation (Relation): the cached relation of SigmaProtocol.getRelation
+    """
+
+    #The proof of equality is the Sigma-protocol for the relation
+    #h1 = w*g1 and h2 = w*g2
+    return SigmaProtocol.getRelation(group, [[g1], [g2]])
+
+def proofGen(q, g1, g2, w, seed=None):
     """Generates the full proof
     commitment, challenge and response
 
@@ -128,26 +154,57 @@ def proofGen(q, g1, g2, w):
         q (Bn): the group order
         g1, g2 (EcPt): the two group generators
         w (Bn): the Prover witness
+        seed (bytes): must be None, the challenge is drawn at random
+                      and a reproducible nonce would reveal the witness
+                      when the same seed is used twice
         
 
     Returns:
         a1, a1 (EcPt): the two Prover commitments to randomness r
         e (Bn): random challenge from verifier
         z (Bn): the Prover response 
-    """
 
-    #Prover generates and "sends" commitments to Verifier.
-    #Notice only Prover knows and keeps r
-    commitment1, commitment2, r = Prover_commitment(q, g1, g2)
+    Raises:
+        ValueError: if a seed is given
+    """
 
-    #Verifier "receives" commitment. Generates challenge and "sends" it to Prover
-    challenge = Verifier_challenge(q)
+    #z1 - z2 = (e1 - e2)*w for two proofs with the same nonce
+    if seed is not None:
+        raise ValueError("a seed cannot be used with an interactive protocol")
 
-    #Prover 'receives' challenge. Generates response.
-    response = Prover_response(r, challenge, w, q)
+    #Prover commits, Verifier challenges and Prover responds, as in the
+    #generic Sigma-protocol for the relation h1 = w*g1 and h2 = w*g2
+    (commitment1, commitment2), challenge, responses = SigmaProtocol.proofGen(
+        getRelation(g1.group, g1, g2), (w,))
 
     #Prover 'sends' proof to Verifier for verification
-    return commitment1, commitment2, challenge, response
+    return commitment1, commitment2, challenge, responses[0]
+
+def proofGen_batch(q, g1, g2, witnesses, seed=None, workers=None, chunk_size=Parallel.DEFAULT_CHUNK_SIZE):
+    """Generates the full proofs for a batch of witnesses
+
+    Args:
+        q (Bn): the group order
+        g1, g2 (EcPt): the two group generators
+        witnesses (iterable of Bn): the Prover witnesses
+        seed (bytes): must be None, the challenges are drawn at random
+                      and a reproducible nonce would reveal the witness
+                      when the same seed is used twice
+        workers (int): the number of worker processes, if None or 1
+                       the proofs are generated in the current process
+        chunk_size (int): the number of proofs handed to a worker at a time
+
+    Returns:
+        (generator of bytes): the encoded proofs (commitments, challenge and response),
+                              in the order of the witnesses
+
+    Raises:
+        ValueError: if a seed is given
+    """
+
+    #The challenges are random, so SigmaProtocol.proofGen_batch refuses a seed
+    return SigmaProtocol.proofGen_batch(getRelation(g1.group, g1, g2), (((w,), ()) for w in witnesses),
+                                        True, seed, workers, chunk_size)
 
 def verify(group, g1, g2, h1, h2, proof):
     """Verifies the full proof received from the prover
@@ -162,20 +219,15 @@ def verify(group, g1, g2, h1, h2, proof):
         (bool) : returns true only if all checks are accepted, else false 
     """
     
+    #Proofs with the wrong number of values are rejected before unpacking
+    if not SigmaProtocol.wellFormed(proof, 4):
+        return False
+
     a1, a2, e, z = proof
     
-    #Verifies that the reponse corresponds with the commitments
-    v1 = z*g1 == a1+e*h1 
-    v2 = z*g2 == a2 + e * h2
-
-    #Checks that the generators and public keys are on the curve
-    v_g1 = group.check_point(g1)
-    v_h1 = group.check_point(h1)
-    v_g2 = group.check_point(g2)
-    v_h2 = group.check_point(h2)
-
-    #All checks should be True for the proof to be accepted
-    return v1 & v2 & v_g1 & v_g2 & v_h1 & v_h2
+    #Checks that the generators and public keys are on the curve and that
+    #the reponse corresponds with the commitments, z*g1 == a1+e*h1 and z*g2 == a2+e*h2
+    return SigmaProtocol.verify(getRelation(group, g1, g2), (h1, h2), (a1, a2), e, (z,))
 
 """#Generation of public knowledge
 group, q, g1, g2 = groupGen()
@@ -7,6 +7,9 @@ in Ivan Damgård's paper "On Sigma-Protocols".
 This file consists of functions that together can be used to run
 a full proof of knowledge.
 
+The step functions, proofGen, proofGen_batch and verify run the generic
+Sigma-protocol of SigmaProtocol.py for the relation h = w*g.
+
 This file requires that the environment you are running on have the "petlib"
 library installed.
 
@@ -16,8 +19,11 @@ The file contains the following functions:
     - Prover_commitment: returns the commitment and prover randomness
     - Verifier_challenge: returns the challenge
     - Prover_response: returns the response
+    - getRelation: returns the Sigma-protocol relation of the proof
     - proofGen: returns the generated proof consisting of
                 commitment, challenge, response
+    - proofGen_batch: returns a stream of encoded proofs for a batch,
+                      optionally generated by a pool of worker processes
     - verify: returns True or False depending on whether the
               proof was accepted
 
@@ -27,6 +33,8 @@ These are commented out, but are kept in the file for documentation purposes.
 """
 
 from petlib import ec
+import Parallel
+import SigmaProtocol
 import time
 
 def groupGen():
@@ -63,12 +71,13 @@ def keyGen(q, g):
     
     return w, h
 
-def Prover_commitment(q, g):
+def Prover_commitment(q, g, r=None):
     """Generates a Prover commitment (step one in protocol)
 
     Args:
         q (Bn): the group order
         g (EcPt): the group generator
+        r (Bn): randomness to commit to, drawn at random if None
 
     Returns:
         a (EcPt): the Prover commitment to randomness r
@@ -76,10 +85,9 @@ def Prover_commitment(q, g):
         
     """
 
-    r = q.random()
-    a = r*g
+    commitments, r = SigmaProtocol.Prover_commitment(getRelation(g.group, g), None if r is None else (r,))
 
-    return a, r
+    return commitments[0], r[0]
 
 def Verifier_challenge(q):
     """Generates a Verifier challenge (step two in protocol)
@@ -110,11 +118,28 @@ def Prover_response(r, e, w, q):
         
     """
 
-    z = r + e*w % q
+    z, = SigmaProtocol.computeResponses(q, (r,), e, (w,))
 
     return z
 
-def proofGen(q, g, w):
+def getRelation(group, g):
+    """Returns the Sigma-protocol relation h = w*g of the proof
+
+    The relation is what the functions of the file run on SigmaProtocol.py,
+    e.g. for verifyBatch or the audit of transcripts.
+
+    Args:
+        group (EcGroup): the EC group from an EC over a finite field
+        g (EcPt): the group generator
+
+    Returns:
+        relation (Relation): the cached relation of SigmaProtocol.getRelation
+    """
+
+    #The proof of knowledge is the Sigma-protocol for the relation h = w*g
+    return SigmaProtocol.getRelation(group, [[g]])
+
+def proofGen(q, g, w, seed=None):
     """Generates the full proof
     commitment, challenge and response
 
@@ -122,26 +147,57 @@ def proofGen(q, g, w):
         q (Bn): the group order
         g (EcPt): the group generator
         w (Bn): the Prover witness
+        seed (bytes): must be None, the challenge is drawn at random
+                      and a reproducible nonce would reveal the witness
+                      when the same seed is used twice
         
 
     Returns:
         a (EcPt): the Prover commitment to randomness r
         e (Bn): random challenge from verifier
         z (Bn): the Prover response 
-    """
 
-    #Prover generates and 'sends' commitment to Verifier.
-    #Notice only Prover knows and keeps r
-    commitment, r = Prover_commitment(q, g)
+    Raises:
+        ValueError: if a seed is given
+    """
 
-    #Verifier 'receives' commitment. Generates challenge and 'sends' it to Prover
-    challenge = Verifier_challenge(q)
+    #z1 - z2 = (e1 - e2)*w for two proofs with the same nonce
+    if seed is not None:
+        raise ValueError("a seed cannot be used with an interactive protocol")
 
-    #Prover 'receives' challenge. Generates response.
-    response = Prover_response(r, challenge, w, q)
+    #Prover commits, Verifier challenges and Prover responds,
+    #as in the generic Sigma-protocol for the relation h = w*g
+    commitments, challenge, responses = SigmaProtocol.proofGen(
+        getRelation(g.group, g), (w,))
 
     #Prover 'sends' proof to Verifier for verification
-    return commitment, challenge, response
+    return commitments[0], challenge, responses[0]
+
+def proofGen_batch(q, g, witnesses, seed=None, workers=None, chunk_size=Parallel.DEFAULT_CHUNK_SIZE):
+    """Generates the full proofs for a batch of witnesses
+
+    Args:
+        q (Bn): the group order
+        g (EcPt): the group generator
+        witnesses (iterable of Bn): the Prover witnesses
+        seed (bytes): must be None, the challenges are drawn at random
+                      and a reproducible nonce would reveal the witness
+                      when the same seed is used twice
+        workers (int): the number of worker processes, if None or 1
+                       the proofs are generated in the current process
+        chunk_size (int): the number of proofs handed to a worker at a time
+
+    Returns:
+        (generator of bytes): the encoded proofs (commitment, challenge and response),
+                              in the order of the witnesses
+
+    Raises:
+        ValueError: if a seed is given
+    """
+
+    #The challenges are random, so SigmaProtocol.proofGen_batch refuses a seed
+    return SigmaProtocol.proofGen_batch(getRelation(g.group, g), (((w,), ()) for w in witnesses),
+                                        True, seed, workers, chunk_size)
 
 def verify(group, g, h, proof):
     """Verifies the full proof received from the prover
@@ -156,17 +212,15 @@ def verify(group, g, h, proof):
         (bool) : returns true only if all checks are accepted, else false 
     """
 
-    a, e, z = proof
-
-    #Verifies that the reponse corresponds with the commitment
-    v = z*g == a+e*h
+    #Proofs with the wrong number of values are rejected before unpacking
+    if not SigmaProtocol.wellFormed(proof, 3):
+        return False
 
-    #Checks that g and h are on the curve
-    g_v = group.check_point(g) 
-    h_v = group.check_point(h)
+    a, e, z = proof
 
-    #All checks should be True for the proof to be accepted
-    return v & g_v & h_v
+    #Checks that g and h are on the curve and that
+    #the reponse corresponds with the commitment, z*g == a+e*h
+    return SigmaProtocol.verify(getRelation(group, g), (h,), (a,), e, (z,))
 
 
 """#Generation of public knowledge
@@ -0,0 +1,226 @@
+"""Elliptic curve proof of knowledge of a representation
+
+This file contains an elliptic curve implementation of the proof of
+knowledge of a representation, the generalisation of the proof of knowledge
+on page 1 in Ivan Damgård's paper "On Sigma-Protocols" to several witnesses.
+The Prover shows knowledge of w1, ..., wn such that
+
+    h = w1*g1 + w2*g2 + ... + wn*gn
+
+e.g. the opening of a Pedersen commitment when n is 2.
+
+This file consists of functions that together can be used to run
+a full proof of knowledge of a representation.
+
+proofGen and verify run the generic Sigma-protocol of SigmaProtocol.py,
+so the n+1 term verification equation is checked with one
+multi-scalar multiplication.
+
+This file requires that the environment you are running on have the "petlib" and "ZKSK"
+libraries installed.
+
+The file contains the following functions:
+    - groupGen: returns the EC group, group order, and n group generators
+    - keyGen: returns the key set consisting of n secrets and a public key
+    - Prover_commitment: returns the commitment and prover randomness
+    - Verifier_challenge: returns the challenge
+    - Prover_response: returns the responses
+    - getRelation: returns the Sigma-protocol relation of the proof
+    - proofGen: returns the generated proof consisting of
+                commitment, challenge, responses
+    - verify: returns True or False depending on whether the
+              proof was accepted
+
+At the end of the file some examples of how to run a full proof of knowledge
+of a representation as well as how the time taking is done for the analysis of the project.
+These are commented out, but are kept in the file for documentation purposes.
+"""
+
+from petlib import ec
+import Generators
+import SigmaProtocol
+import time
+
+def groupGen(n):
+    """Generates an EC group, group order and n generators
+
+    Args:
+        n (int): the number of generators, one per witness
+
+    Returns:
+        group (EcGroup): the EC group from an EC over a finite field
+        q (Bn): the group order
+        generators (list of EcPt): n group generators
+    """
+
+    group = ec.EcGroup()
+    q = group.order()
+
+    #using the "zksk" library method for getting n different
+    #generators for the same EC group, cached between calls
+    generators = Generators.getGenerators(n, group)
+
+    return group, q, generators
+
+def keyGen(q, generators):
+    """Generates n secrets and a public key for Prover using the EC group
+
+    Args:
+        q (Bn): the group order
+        generators (list of EcPt): the n group generators
+
+    Returns:
+        w (tuple of Bn): the Prover secret keys, also called the witnesses
+        h (EcPt): the Prover public key
+    """
+
+    w = tuple(q.random() for _ in generators)
+    h, = SigmaProtocol.statement(getRelation(generators[0].group, generators), w)
+
+    return w, h
+
+def Prover_commitment(q, generators, r=None):
+    """Generates a Prover commitment (step one in protocol)
+
+    Args:
+        q (Bn): the group order
+        generators (list of EcPt): the n group generators
+        r (tuple of Bn): randomness to commit to, drawn at random if None
+
+    Returns:
+        a (EcPt): the Prover commitment to randomness r
+        r (tuple of Bn): randomness
+
+    """
+
+    commitments, r = SigmaProtocol.Prover_commitment(getRelation(generators[0].group, generators), r)
+
+    return commitments[0], r
+
+def Verifier_challenge(q):
+    """Generates a Verifier challenge (step two in protocol)
+
+    Args:
+        q (Bn): the group order
+
+    Returns:
+        e (Bn): random challenge
+
+    """
+
+    e = q.random()
+
+    return e
+
+def Prover_response(r, e, w, q):
+    """Generates the Prover responses (step three in protocol)
+
+    Args:
+        r (tuple of Bn): randomness
+        e (Bn): random challenge from verifier
+        w (tuple of Bn): the Prover witnesses
+        q (Bn): the group order
+
+    Returns:
+        z (tuple of Bn): the Prover responses
+
+    """
+
+    z = SigmaProtocol.computeResponses(q, r, e, w)
+
+    return z
+
+def getRelation(group, generators):
+    """Returns the Sigma-protocol relation h = w1*g1 + ... + wn*gn of the proof
+
+    The relation is what the functions of the file run on SigmaProtocol.py,
+    e.g. for verifyBatch or the audit of transcripts.
+
+    Args:
+        group (EcGroup): the EC group from an EC over a finite field
+        generators (list of EcPt): the n group generators
+
+    Returns:
+        relation (Relation): the cached relation of SigmaProtocol.getRelation
+    """
+
+    #The proof of knowledge of a representation is the Sigma-protocol
+    #for the relation h = w1*g1 + ... + wn*gn
+    return SigmaProtocol.getRelation(group, [list(generators)])
+
+def proofGen(q, generators, w, seed=None):
+    """Generates the full proof
+    commitment, challenge and responses
+
+    Args:
+        q (Bn): the group order
+        generators (list of EcPt): the n group generators
+        w (tuple of Bn): the Prover witnesses
+        seed (bytes): must be None, the challenge is drawn at random
+                      and reproducible nonces would reveal the witnesses
+                      when the same seed is used twice
+
+    Returns:
+        a (EcPt): the Prover commitment to randomness r
+        e (Bn): random challenge from verifier
+        z (tuple of Bn): the Prover responses
+
+    Raises:
+        ValueError: if a seed is given
+    """
+
+    #z1_i - z2_i = (e1 - e2)*w_i for two proofs with the same nonces
+    if seed is not None:
+        raise ValueError("a seed cannot be used with an interactive protocol")
+
+    #Prover commits, Verifier challenges and Prover responds,
+    #as in the generic Sigma-protocol for the relation
+    commitments, challenge, responses = SigmaProtocol.proofGen(
+        getRelation(generators[0].group, generators), w)
+
+    #Prover 'sends' proof to Verifier for verification
+    return commitments[0], challenge, responses
+
+def verify(group, generators, h, proof):
+    """Verifies the full proof received from the prover
+
+    Args:
+        group (EcGroup): the EC group from an EC over a finite field
+        generators (list of EcPt): the n group generators
+        h (EcPt): the Prover public key
+        proof (EcPt, Bn, tuple of Bn): commitment, challenge and responses
+
+    Returns:
+        (bool) : returns true only if all checks are accepted, else false
+    """
+
+    #Proofs with the wrong number of values are rejected before unpacking
+    if not SigmaProtocol.wellFormed(proof, 3):
+        return False
+
+    a, e, z = proof
+
+    #Checks that the generators and h are on the curve and that the responses
+    #correspond with the commitment, z1*g1 + ... + zn*gn - e*h == a
+    return SigmaProtocol.verify(getRelation(group, generators), (h,), (a,), e, z)
+
+
+"""#Generation of public knowledge
+group, q, generators = groupGen(8)
+
+#Prover generates their secrets and public key, "publishing" the public key
+w, h = keyGen(q, generators)
+
+startProof = time.process_time_ns()
+#Prover generates proof, with challenge from Verifier
+proof = proofGen(q, generators, w)
+finishProof = time.process_time_ns() - startProof
+
+startVerify = time.process_time_ns()
+#Verifier "receives" proof and verifies it:
+v = verify(group, generators, h, proof)
+finishVerify = time.process_time_ns() - startVerify
+
+print("PoR Proof verified:", v)
+print("PoR Proof Generation time:", finishProof)
+print("PoR Proof Verification time:", finishVerify)"""
@@ -0,0 +1,298 @@
+"""Point tables shared between worker processes
+
+This file contains tables of EC points, the generators of groupGen,
+that are built once and shared read-only by all worker processes, either in shared memory or in a file mapped into
+memory. Workers attach to the table without copying it, so a deployment
+with many workers keeps a single copy of the encoded table. The points
+themselves are petlib objects that live in the memory of every process:
+readPoint decodes only the record it is asked for, and loadGenerators
+decodes the generators once per worker, which is much cheaper than
+recomputing them, about a millisecond each. Workers started with fork
+inherit the generators of the parent anyway, the table matters for workers
+started with spawn or forkserver, and for workers of other programs.
+
+Public keys are not shared: the tables of KeyTables.py hold decoded points
+and values precomputed from them, which are per process objects, and every
+worker builds the tables of the keys it verifies, so a shared table of the
+encoded keys would only save decoding the few hot keys once per worker.
+
+A table starts with a header holding a magic value, the OpenSSL id of the
+curve, the width of a record and the number of records. Every record is a
+length byte followed by the uncompressed encoding of a point, padded to
+the width, so point i is read straight from its offset in the table.
+
+This file requires that the environment you are running on have the "petlib"
+library installed.
+
+The file contains the following functions:
+    - encodeTable: returns the table of a list of points as bytes
+    - createTable: returns a new shared memory block holding a table
+    - writeTableFile: writes a table to a file
+    - attachTable: returns the shared memory block of an existing table
+    - openTableFile: returns a read-only memory map of a table file
+    - tableNid: returns the OpenSSL id of the curve of a table
+    - tableLength: returns the number of points of a table
+    - readPoint: returns the i'th point of a table
+    - readPoints: returns all points of a table
+    - shareGenerators: returns a new shared memory block with the first n generators
+    - loadGenerators: adds the generators of a table to the generator cache
+    - initGenerators: attaches to a shared generator table and loads it,
+                      for use as the initializer of a worker pool
+    - sharedGenerators: shares the first n generators with a worker pool
+                        while the pool is in use
+"""
+
+from contextlib import contextmanager
+from multiprocessing import shared_memory, resource_tracker
+import Encoding
+import Generators
+import mmap
+import os
+import struct
+import sys
+
+MAGIC = b"ZKT1"
+HEADER = struct.Struct(">4sHHI")
+
+_attached = {}
+_created = set()
+
+def encodeTable(points):
+    """Returns the table of a list of points as bytes
+
+    Args:
+        points (list of EcPt): the points, all on the same curve
+
+    Returns:
+        (bytes): the header followed by one record per point
+    """
+
+    encoded = [Encoding.encodePoint(pt) for pt in points]
+    width = max((len(data) for data in encoded), default=0)
+    nid = points[0].group.nid() if points else 0
+
+    records = [bytes((len(data),)) + data.ljust(width, b"\x00") for data in encoded]
+
+    return HEADER.pack(MAGIC, nid, width, len(points)) + b"".join(records)
+
+def createTable(points, name=None):
+    """Creates a new shared memory block holding a table
+
+    The process creating the table owns it and has to call close() and
+    unlink() on the block when the table is no longer used.
+
+    Args:
+        points (list of EcPt): the points, all on the same curve
+        name (str): the name of the block, a random name is used if None
+
+    Returns:
+        (SharedMemory): the block, its name is passed to the workers
+    """
+
+    table = encodeTable(points)
+    block = shared_memory.SharedMemory(name=name, create=True, size=len(table))
+    block.buf[:len(table)] = table
+    _created.add(block.name)
+
+    return block
+
+def writeTableFile(path, points):
+    """Writes a table to a file
+
+    Args:
+        path (str): the path of the file
+        points (list of EcPt): the points, all on the same curve
+
+    Returns:
+        None
+    """
+
+    with open(path, "wb") as f:
+        f.write(encodeTable(points))
+
+def attachTable(name):
+    """Returns the shared memory block of an existing table
+
+    A process attaches to a block once and keeps it attached, later calls
+    return the same block. The block is not tracked by the attaching process,
+    so a worker exiting does not remove the table while other workers still use it.
+
+    Args:
+        name (str): the name of the block
+
+    Returns:
+        (SharedMemory): the block, the table is read from its buf attribute
+    """
+
+    block = _attached.get(name)
+    if block is not None:
+        return block
+
+    if sys.version_info >= (3, 13):
+        block = _attached[name] = shared_memory.SharedMemory(name=name, track=False)
+        return block
+
+    #Before Python 3.13 every process that attaches to a block also registers
+    #it for removal at exit, under its POSIX name with a leading slash, and
+    #only the owner should remove it
+    block = _attached[name] = shared_memory.SharedMemory(name=name)
+    if os.name == "posix" and name not in _created:
+        resource_tracker.unregister("/" + block.name, "shared_memory")
+
+    return block
+
+def openTableFile(path):
+    """Returns a read-only memory map of a table file
+
+    Args:
+        path (str): the path of the file
+
+    Returns:
+        (mmap): the memory map, which can be read like the buf of a block
+    """
+
+    with open(path, "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+def _header(buffer):
+    magic, nid, width, count = HEADER.unpack_from(buffer, 0)
+    if magic != MAGIC:
+        raise ValueError("not a point table")
+
+    return nid, width, count
+
+def tableNid(buffer):
+    """Returns the OpenSSL id of the curve of a table
+
+    Args:
+        buffer (buffer): the buf of a block or a memory map
+
+    Returns:
+        (int): the OpenSSL id of the curve
+    """
+
+    return _header(buffer)[0]
+
+def tableLength(buffer):
+    """Returns the number of points of a table
+
+    Args:
+        buffer (buffer): the buf of a block or a memory map
+
+    Returns:
+        (int): the number of points
+    """
+
+    return _header(buffer)[2]
+
+def readPoint(group, buffer, i):
+    """Returns the i'th point of a table
+
+    Only the record of the point is read, the rest of the table is not copied.
+
+    Args:
+        group (EcGroup): the EC group of the table
+        buffer (buffer): the buf of a block or a memory map
+        i (int): the index of the point
+
+    Returns:
+        (EcPt): the point
+
+    Raises:
+        IndexError: if the table has no i'th point
+    """
+
+    nid, width, count = _header(buffer)
+    if not 0 <= i < count:
+        raise IndexError("point table index out of range")
+
+    offset = HEADER.size + i * (width + 1)
+    length = buffer[offset]
+
+    return Encoding.decodePoint(group, buffer[offset+1:offset+1+length])
+
+def readPoints(group, buffer):
+    """Returns all points of a table
+
+    Args:
+        group (EcGroup): the EC group of the table
+        buffer (buffer): the buf of a block or a memory map
+
+    Returns:
+        (list of EcPt): the points
+    """
+
+    return [readPoint(group, buffer, i) for i in range(tableLength(buffer))]
+
+def shareGenerators(n, group, name=None):
+    """Creates a new shared memory block with the first n generators of the group
+
+    Args:
+        n (int): the number of generators
+        group (EcGroup): the EC group from an EC over a finite field
+        name (str): the name of the block, a random name is used if None
+
+    Returns:
+        (SharedMemory): the block, owned by the calling process
+    """
+
+    return createTable(Generators.getGenerators(n, group), name)
+
+def loadGenerators(buffer):
+    """Adds the generators of a table to the generator cache
+
+    Used in worker processes, e.g. as the initializer of a pool, so that
+    groupGen finds the generators in the cache instead of computing them.
+
+    Args:
+        buffer (buffer): the buf of a block or a memory map
+
+    Returns:
+        (list of EcPt): the generators
+    """
+
+    group = Encoding.getGroup(tableNid(buffer))
+    generators = readPoints(group, buffer)
+    Generators.setGenerators(generators, group)
+
+    return generators
+
+def initGenerators(name):
+    """Attaches to a shared generator table and adds the generators to the cache
+
+    Meant as the initializer of a pool of worker processes,
+    e.g. Parallel.mapChunks(..., initializer=initGenerators, initargs=(block.name,))
+
+    Args:
+        name (str): the name of the block created with shareGenerators
+
+    Returns:
+        None
+    """
+
+    loadGenerators(attachTable(name).buf)
+
+@contextmanager
+def sharedGenerators(n, group):
+    """Shares the first n generators with a worker pool while the pool is in use
+
+    The block is created on entry and removed on exit, e.g.
+
+        with sharedGenerators(2, group) as pool:
+            results = Parallel.mapChunks(function, chunks, workers, **pool)
+
+    Args:
+        n (int): the number of generators
+        group (EcGroup): the EC group from an EC over a finite field
+
+    Returns:
+        (dict): the initializer and initargs arguments of Parallel.mapChunks
+    """
+
+    block = shareGenerators(n, group)
+    try:
+        yield {"initializer": initGenerators, "initargs": (block.name,)}
+    finally:
+        _created.discard(block.name)
+        block.close()
+        block.unlink()
@@ -0,0 +1,619 @@
+"""Sigma-protocols for linear relations over an elliptic curve group
+
+This file contains a generic implementation of the Sigma-protocols
+described in Ivan Damgård's paper "On Sigma-Protocols" for relations of the form
+
+    h_j = w_1*g_j1 + w_2*g_j2 + ... + w_n*g_jn    for j = 1, ..., m
+
+where the witnesses w_1, ..., w_n are known to the Prover and the bases g_ji
+and the statement h_1, ..., h_m are public. A base can be left out of a row
+with None, e.g. the proof of equality is the relation with the rows
+h1 = w*g1 and h2 = w*g2.
+
+Both the interactive protocol and the non-interactive version using
+the Fiat-Shamir heuristic are provided. The relation is compiled once
+with makeRelation, which validates the bases and precomputes a verification
+plan, so a relation can be reused for any number of proofs.
+getRelation keeps the recently used relations, so callers that only
+have the bases at hand do not compile the same relation again.
+Each row of the plan is checked with a single multi-scalar multiplication,
+
+    z_1*g_j1 + ... + z_n*g_jn - sign*e*h_j == a_j
+
+which is cheaper than computing every product on its own.
+Verification is done in stages, from the cheapest check to the most
+expensive one, and stops at the first stage that fails,
+see VerifyStats.py for the stages and their counters.
+
+The sign of the response, z = r + sign*e*w, and the transcript hashed to
+get the non-interactive challenge can be chosen when the relation is compiled,
+so the existing proof formats of the project can be expressed as relations.
+
+proofGen_batch generates the proofs of a batch, optionally in worker
+processes, for any relation. The protocol files only wrap it, and the
+step functions above, with the arguments and proof formats of the protocol.
+
+This file requires that the environment you are running on have the "petlib"
+and "hashlib" libraries installed.
+
+The file contains the following functions:
+    - makeRelation: returns the compiled relation
+    - getRelation: returns the compiled relation from a cache of recently used relations
+    - defaultTranscript: returns the Fiat-Shamir challenge of a transcript
+    - statement: returns the statement h_1, ..., h_m for given witnesses
+    - Prover_commitment: returns the commitments and prover randomness
+    - Verifier_challenge: returns a random challenge
+    - Prover_challenge: returns the Fiat-Shamir challenge
+    - Prover_response: returns the responses
+    - computeResponses: returns the responses for a group order and sign
+    - proofGen: returns an interactive proof consisting of
+                commitments, challenge and responses
+    - proofGenNI: returns a non-interactive proof consisting of
+                  commitments and responses
+    - proofGen_batch: returns a stream of encoded proofs for a batch,
+                      optionally generated by a pool of worker processes
+    - wellFormed: returns True or False depending on whether a proof
+                  has the expected number of values
+    - verify: returns True or False depending on whether the
+              interactive proof was accepted
+    - verifyNI: returns True or False depending on whether the
+                non-interactive proof was accepted
+    - verifyBatch: returns True or False depending on whether all
+                   interactive proofs of a batch were accepted
+"""
+
+from petlib import ec, bn
+from hashlib import sha256
+from collections import namedtuple, OrderedDict
+from os import urandom
+import DeterministicNonce
+import Encoding
+import KeyTables
+import Parallel
+import VerifyStats
+
+RELATION_CACHE_SIZE = 256
+BATCH_BITS = 128
+
+_relations = OrderedDict()
+_workerRelations = {}
+
+#group: the EC group, q: the group order, n: the number of witnesses,
+#bases: the distinct bases, rows: the verification plan, one
+#(witness indices, bases) pair per row, sign: the sign of the response,
+#transcript: the Fiat-Shamir challenge function, valid: whether all bases are on the curve,
+#prefix: the sha256 state after hashing the encodings of the bases
+Relation = namedtuple("Relation", ["group", "q", "n", "bases", "rows", "sign", "transcript", "valid", "prefix"])
+
+def _statementDigest(relation, statement):
+    #The sha256 state after hashing the encodings of the bases and the statement
+    digest = relation.prefix.copy()
+    for pt in statement:
+        digest.update(pt.export())
+
+    return digest
+
+def defaultTranscript(relation, statement, commitments):
+    """Generates the Fiat-Shamir challenge of a transcript
+
+    The challenge is the sha256 hash of the encodings of the bases,
+    the statement and the commitments, reduced modulo the group order.
+
+    Args:
+        relation (Relation): the compiled relation
+        statement (tuple of EcPt): the public values h_1, ..., h_m
+        commitments (tuple of EcPt): the Prover commitments a_1, ..., a_m
+
+    Returns:
+        e (Bn): the challenge
+    """
+
+    #The bases are the same for every proof, so hashing continues from the
+    #state after the bases, or after the statement if it has a table in KeyTables
+    digest = KeyTables.memo(statement, relation, lambda: _statementDigest(relation, statement)).copy()
+    for pt in commitments:
+        digest.update(pt.export())
+
+    return bn.Bn.from_binary(digest.digest()) % relation.q
+
+def makeRelation(group, matrix, sign=1, transcript=defaultTranscript):
+    """Compiles a linear relation
+
+    Args:
+        group (EcGroup): the EC group from an EC over a finite field
+        matrix (list of list of EcPt): one row per statement value, each row
+                                       holding the base of every witness or None
+        sign (int): 1 for responses z = r + e*w, -1 for z = r - e*w
+        transcript (function): the Fiat-Shamir challenge function, called as
+                               transcript(relation, statement, commitments)
+
+    Returns:
+        relation (Relation): the compiled relation
+    """
+
+    n = len(matrix[0])
+
+    #The verification plan keeps, for every row, only the witnesses that
+    #have a base in that row, in the order they are passed to the
+    #multi-scalar multiplication
+    rows = []
+    bases = {}
+    for row in matrix:
+        indices = tuple(i for i in range(n) if row[i] is not None)
+        points = tuple(row[i] for i in indices)
+        rows.append((indices, points))
+        for pt in points:
+            bases.setdefault(pt.export(), pt)
+
+    #The bases are fixed, so they only have to be checked once
+    prefix = sha256(b"".join(bases.keys()))
+    bases = tuple(bases.values())
+    valid = all(group.check_point(pt) for pt in bases)
+
+    return Relation(group, group.order(), n, bases, tuple(rows), sign, transcript, valid, prefix)
+
+def getRelation(group, matrix, sign=1, transcript=defaultTranscript):
+    """Returns the compiled linear relation, compiling it on first use
+
+    The relations are cached by the identity of the group and the bases,
+    so a relation is compiled once for every set of bases that is in use.
+    A cached relation holds references to its group and bases,
+    so their identities can not be reused by other objects.
+
+    Args:
+        group (EcGroup): the EC group from an EC over a finite field
+        matrix (list of list of EcPt): one row per statement value, each row
+                                       holding the base of every witness or None
+        sign (int): 1 for responses z = r + e*w, -1 for z = r - e*w
+        transcript (function): the Fiat-Shamir challenge function
+
+    Returns:
+        relation (Relation): the compiled relation
+    """
+
+    key = (id(group), sign, transcript, tuple(tuple(map(id, row)) for row in matrix))
+    relation = _relations.get(key)
+    if relation is None:
+        relation = makeRelation(group, matrix, sign, transcript)
+        if len(_relations) >= RELATION_CACHE_SIZE:
+            _relations.popitem(last=False)
+        _relations[key] = relation
+    else:
+        _relations.move_to_end(key)
+
+    return relation
+
+def statement(relation, witnesses):
+    """Generates the statement h_1, ..., h_m for given witnesses
+
+    Args:
+        relation (Relation): the compiled relation
+        witnesses (tuple of Bn): the Prover witnesses w_1, ..., w_n
+
+    Returns:
+        (tuple of EcPt): the public values h_1, ..., h_m
+    """
+
+    return tuple(relation.group.wsum([witnesses[i] for i in indices], points)
+                 for indices, points in relation.rows)
+
+def Prover_commitment(relation, nonces=None):
+    """Generates the Prover commitments (step one in protocol)
+
+    Args:
+        relation (Relation): the compiled relation
+        nonces (tuple of Bn): the randomness r_1, ..., r_n,
+                              drawn at random if None
+
+    Returns:
+        commitments (tuple of EcPt): the Prover commitments a_1, ..., a_m
+        nonces (tuple of Bn): randomness
+    """
+
+    if nonces is None:
+        nonces = tuple(relation.q.random() for _ in range(relation.n))
+
+    commitments = statement(relation, nonces)
+
+    return commitments, nonces
+
+def Verifier_challenge(relation):
+    """Generates a Verifier challenge (step two in interactive protocol)
+
+    Args:
+        relation (Relation): the compiled relation
+
+    Returns:
+        e (Bn): random challenge
+    """
+
+    return relation.q.random()
+
+def Prover_challenge(relation, statement, commitments):
+    """Generates a Prover challenge (step two in non-interactive protocol)
+
+    Args:
+        relation (Relation): the compiled relation
+        statement (tuple of EcPt): the public values h_1, ..., h_m
+        commitments (tuple of EcPt): the Prover commitments a_1, ..., a_m
+
+    Returns:
+        e (Bn): the challenge
+    """
+
+    return relation.transcript(relation, statement, commitments)
+
+def Prover_response(relation, nonces, e, witnesses):
+    """Generates the Prover responses (step three in protocol)
+
+    Args:
+        relation (Relation): the compiled relation
+        nonces (tuple of Bn): randomness
+        e (Bn): the challenge
+        witnesses (tuple of Bn): the Prover witnesses w_1, ..., w_n
+
+    Returns:
+        responses (tuple of Bn): the Prover responses z_1, ..., z_n
+    """
+
+    return computeResponses(relation.q, nonces, e, witnesses, relation.sign)
+
+def computeResponses(q, nonces, e, witnesses, sign=1):
+    """Generates the Prover responses z_i = r_i + sign*e*w_i
+
+    Used by the step functions of the protocol files, which
+    have the group order but not the bases at hand.
+
+    Args:
+        q (Bn): the group order
+        nonces (tuple of Bn): randomness
+        e (Bn): the challenge
+        witnesses (tuple of Bn): the Prover witnesses w_1, ..., w_n
+        sign (int): 1 for responses z = r + e*w, -1 for z = r - e*w
+
+    Returns:
+        responses (tuple of Bn): the Prover responses z_1, ..., z_n
+    """
+
+    if sign < 0:
+        return tuple(r - e*w % q for r, w in zip(nonces, witnesses))
+
+    return tuple(r + e*w % q for r, w in zip(nonces, witnesses))
+
+def proofGen(relation, witnesses, nonces=None):
+    """Generates a full interactive proof
+    commitment, challenge and response
+
+    Args:
+        relation (Relation): the compiled relation
+        witnesses (tuple of Bn): the Prover witnesses w_1, ..., w_n
+        nonces (tuple of Bn): randomness, drawn at random if None
+
+    Returns:
+        commitments (tuple of EcPt): the Prover commitments
+        e (Bn): random challenge from verifier
+        responses (tuple of Bn): the Prover responses
+    """
+
+    commitments, nonces = Prover_commitment(relation, nonces)
+    e = Verifier_challenge(relation)
+    responses = Prover_response(relation, nonces, e, witnesses)
+
+    return commitments, e, responses
+
+def proofGenNI(relation, witnesses, statement, nonces=None):
+    """Generates a full non-interactive proof
+    commitment, challenge and response
+
+    Args:
+        relation (Relation): the compiled relation
+        witnesses (tuple of Bn): the Prover witnesses w_1, ..., w_n
+        statement (tuple of EcPt): the public values h_1, ..., h_m
+        nonces (tuple of Bn): randomness, drawn at random if None
+
+    Returns:
+        commitments (tuple of EcPt): the Prover commitments
+        responses (tuple of Bn): the Prover responses
+    """
+
+    commitments, nonces = Prover_commitment(relation, nonces)
+    e = Prover_challenge(relation, statement, commitments)
+    responses = Prover_response(relation, nonces, e, witnesses)
+
+    return commitments, responses
+
+def _batchNonces(relation, seed, start, keys):
+    #The randomness of every proof of a chunk, the i'th proof derives it as
+    #the protocol files do for a single proof with the seed seed + i.to_bytes(8, "big")
+    q, n = relation.q, relation.n
+    if seed is None:
+        return [tuple(q.random() for _ in range(n)) for _ in keys]
+
+    statements = [relation.bases + tuple(statement) for witnesses, statement in keys]
+    if n == 1:
+        nonces = DeterministicNonce.deriveNonces(q, [witnesses[0] for witnesses, statement in keys],
+                                                 statements, seed, start)
+        return [(r,) for r in nonces]
+
+    return [tuple(DeterministicNonce.deriveNonces(q, witnesses, [statement]*n, seed + i.to_bytes(8, "big")))
+            for i, ((witnesses, h), statement) in enumerate(zip(keys, statements), start)]
+
+def _proofGen_chunk(chunk):
+    #Generates the encoded proofs for one chunk of a batch
+    relation, interactive, seed, start, keys = chunk
+
+    records = []
+    for (witnesses, statement), nonces in zip(keys, _batchNonces(relation, seed, start, keys)):
+        commitments, nonces = Prover_commitment(relation, nonces)
+        if interactive:
+            e = Verifier_challenge(relation)
+        else:
+            e = Prover_challenge(relation, tuple(statement), commitments)
+        responses = Prover_response(relation, nonces, e, witnesses)
+        records.append(Encoding.encodeRecord(commitments + ((e,) if interactive else ()) + responses))
+
+    return records
+
+def _workerRelation(nid, matrix, sign, transcript):
+    #The relation of a chunk sent to a worker process, compiled once per process
+    key = (nid, matrix, sign, transcript)
+    relation = _workerRelations.get(key)
+    if relation is None:
+        group = Encoding.getGroup(nid)
+        rows = [[None if pt is None else Encoding.decodePoint(group, pt) for pt in row] for row in matrix]
+        relation = _workerRelations[key] = makeRelation(group, rows, sign, transcript)
+
+    return relation
+
+def _proofGen_encodedChunk(chunk):
+    #Decodes a chunk that was sent to a worker process and generates its proofs
+    nid, matrix, sign, transcript, interactive, seed, start, keys = chunk
+    relation = _workerRelation(nid, matrix, sign, transcript)
+
+    decoded = []
+    for key in keys:
+        values = Encoding.decodeRecord(relation.group, key)
+        decoded.append((values[:relation.n], values[relation.n:]))
+
+    return _proofGen_chunk((relation, interactive, seed, start, decoded))
+
+def _encodeMatrix(relation):
+    #The bases of the relation, one row per statement value, as encodings or None
+    matrix = []
+    for indices, points in relation.rows:
+        row = [None] * relation.n
+        for i, pt in zip(indices, points):
+            row[i] = Encoding.encodePoint(pt)
+        matrix.append(tuple(row))
+
+    return tuple(matrix)
+
+def proofGen_batch(relation, keys, interactive, seed=None, workers=None, chunk_size=Parallel.DEFAULT_CHUNK_SIZE):
+    """Generates the full proofs for a batch of key sets
+
+    The proofs are encoded as by Encoding.encodeRecord, the commitments,
+    the challenge of an interactive proof, and the responses. The transcript
+    of the relation must be defined at the top level of a module when
+    workers are used, so the workers can compile the relation again.
+
+    Args:
+        relation (Relation): the compiled relation
+        keys (iterable of tuples): (witnesses, statement) for every proof,
+                                   the statement is not used by interactive proofs
+        interactive (bool): whether the challenges are drawn at random,
+                            else they are the Fiat-Shamir challenges
+        seed (bytes): if given, the randomness of the i'th proof is derived
+                      deterministically from the seed seed + i.to_bytes(8, "big"),
+                      only for non-interactive proofs
+        workers (int): the number of worker processes, if None or 1
+                       the proofs are generated in the current process
+        chunk_size (int): the number of proofs handed to a worker at a time
+
+    Returns:
+        (generator of bytes): the encoded proofs, in the order of the keys
+
+    Raises:
+        ValueError: if a seed is given for interactive proofs
+    """
+
+    #z1 - z2 = (e1 - e2)*w for two proofs with the same nonce
+    if interactive and seed is not None:
+        raise ValueError("a seed cannot be used with an interactive protocol")
+
+    parallel = workers is not None and workers > 1
+    if parallel:
+        nid, matrix = relation.group.nid(), _encodeMatrix(relation)
+
+    def chunks():
+        start = 0
+        for chunk in Parallel.chunked(keys, chunk_size):
+            if parallel:
+                yield (nid, matrix, relation.sign, relation.transcript, interactive, seed, start,
+                       [Encoding.encodeRecord(tuple(witnesses) + tuple(statement)) for witnesses, statement in chunk])
+            else:
+                yield relation, interactive, seed, start, chunk
+            start += len(chunk)
+
+    function = _proofGen_encodedChunk if parallel else _proofGen_chunk
+    for proofs in Parallel.mapChunks(function, chunks(), workers):
+        yield from proofs
+
+def wellFormed(proof, length):
+    """Checks that a proof has the expected number of values
+
+    Used by the protocol files before unpacking a proof,
+    a proof of the wrong form is counted as rejected in the decode stage.
+
+    Args:
+        proof (tuple): the proof
+        length (int): the expected number of values
+
+    Returns:
+        (bool) : returns true only if the proof is a tuple or list of the given length
+    """
+
+    if not isinstance(proof, (tuple, list)) or len(proof) != length:
+        return VerifyStats.reject("decode")
+
+    return True
+
+def _wellFormed(relation, statement, commitments, e, responses):
+    #The number of values and their types, and the size of the scalars,
+    #as an oversized scalar makes the multi-scalar multiplication slower
+    m = len(relation.rows)
+    if not all(isinstance(values, (tuple, list)) for values in (statement, commitments, responses)):
+        return False
+    if len(statement) != m or len(commitments) != m or len(responses) != relation.n:
+        return False
+
+    group = relation.group
+    for pt in tuple(statement) + tuple(commitments):
+        if not isinstance(pt, ec.EcPt) or not (pt.group is group or pt.group == group):
+            return False
+
+    #Responses are at most r + (e*w % q) < 2q, in absolute value
+    bits = relation.q.num_bits() + 1
+    for z in responses:
+        if not isinstance(z, bn.Bn) or z.num_bits() > bits:
+            return False
+
+    return e is None or (isinstance(e, bn.Bn) and e.num_bits() <= bits)
+
+def _verify(relation, statement, commitments, e, responses):
+    #Staged verification, every stage is cheaper than the next one
+    #and a proof is rejected at the first stage that fails
+    start = VerifyStats.clock()
+
+    #Stage 1: the number and types of the values
+    if not _wellFormed(relation, statement, commitments, e, responses):
+        return VerifyStats.reject("decode", start)
+    start = VerifyStats.passed("decode", start)
+
+    #Stage 2: the bases, the statement and the commitments are on the curve,
+    #the bases were already checked when the relation was compiled
+    #and a statement with a table in KeyTables when the table was built
+    group = relation.group
+    known = KeyTables.isValid(statement)
+    points = tuple(commitments) if known else tuple(statement) + tuple(commitments)
+    if not relation.valid or known is False or not all(group.check_point(pt) for pt in points):
+        return VerifyStats.reject("points", start)
+    start = VerifyStats.passed("points", start)
+
+    #Stage 3: the Fiat-Shamir challenge of a non-interactive proof
+    if e is None:
+        e = Prover_challenge(relation, statement, commitments)
+        start = VerifyStats.passed("transcript", start)
+
+    #Stage 4: every row is checked with one multi-scalar multiplication
+    #z_1*g_j1 + ... + z_n*g_jn - sign*e*h_j == a_j
+    e_weight = -e if relation.sign > 0 else e
+    for (indices, points), h, a in zip(relation.rows, statement, commitments):
+        weights = [responses[i] for i in indices]
+        weights.append(e_weight)
+        if group.wsum(weights, points + (h,)) != a:
+            return VerifyStats.reject("arithmetic", start)
+    VerifyStats.passed("arithmetic", start)
+
+    return VerifyStats.accept()
+
+def verify(relation, statement, commitments, e, responses):
+    """Verifies a full interactive proof
+
+    The checks are done in stages, from the cheapest to the most expensive,
+    and the proof is rejected at the first stage that fails.
+    The rejections and the time spent in every stage are counted in VerifyStats.
+
+    Args:
+        relation (Relation): the compiled relation
+        statement (tuple of EcPt): the public values h_1, ..., h_m
+        commitments (tuple of EcPt): the Prover commitments a_1, ..., a_m
+        e (Bn): the challenge
+        responses (tuple of Bn): the Prover responses z_1, ..., z_n
+
+    Returns:
+        (bool) : returns true only if all checks are accepted, else false
+    """
+
+    if e is None:
+        return VerifyStats.reject("decode")
+
+    return _verify(relation, statement, commitments, e, responses)
+
+def verifyNI(relation, statement, commitments, responses):
+    """Verifies a full non-interactive proof
+
+    The checks are done in stages, from the cheapest to the most expensive,
+    and the proof is rejected at the first stage that fails, so the challenge
+    is only computed for proofs of the right form with points on the curve.
+    The rejections and the time spent in every stage are counted in VerifyStats.
+
+    Args:
+        relation (Relation): the compiled relation
+        statement (tuple of EcPt): the public values h_1, ..., h_m
+        commitments (tuple of EcPt): the Prover commitments a_1, ..., a_m
+        responses (tuple of Bn): the Prover responses z_1, ..., z_n
+
+    Returns:
+        (bool) : returns true only if all checks are accepted, else false
+    """
+
+    return _verify(relation, statement, commitments, None, responses)
+
+def verifyBatch(relation, instances):
+    """Verifies a batch of interactive proofs with one multi-scalar multiplication
+
+    Every verification equation of every proof is multiplied by a random
+    BATCH_BITS bit scalar rho and the equations are added up,
+
+        sum of rho * (z_1*g_j1 + ... + z_n*g_jn - sign*e*h_j - a_j) == 0
+
+    so the bases, and public keys that occur in several proofs, appear in the
+    sum only once. If any proof of the batch is invalid the sum is not zero,
+    except with probability 2^-BATCH_BITS, but the batch does not tell which
+    proof is invalid, so callers verify the proofs of a failed batch one by one.
+    The proofs are not counted in the counters of VerifyStats.py.
+
+    Args:
+        relation (Relation): the compiled relation
+        instances (iterable of tuples): (statement, commitments, e, responses)
+                                        for every proof, as for verify
+
+    Returns:
+        (bool) : returns true only if all proofs are accepted, else false
+    """
+
+    group = relation.group
+    if not relation.valid:
+        return False
+
+    terms = {}
+    def add(pt, weight):
+        term = terms.get(id(pt))
+        if term is None:
+            terms[id(pt)] = [pt, weight]
+        else:
+            term[1] = term[1] + weight
+
+    for statement, commitments, e, responses in instances:
+        if e is None or not _wellFormed(relation, statement, commitments, e, responses):
+            return False
+
+        known = KeyTables.isValid(statement)
+        points = tuple(commitments) if known else tuple(statement) + tuple(commitments)
+        if known is False or not all(group.check_point(pt) for pt in points):
+            return False
+
+        e_weight = -e if relation.sign > 0 else e
+        for (indices, bases), h, a in zip(relation.rows, statement, commitments):
+            rho = bn.Bn.from_binary(urandom(BATCH_BITS // 8))
+            for i, g in zip(indices, bases):
+                add(g, rho*responses[i])
+            add(h, rho*e_weight)
+            add(a, -rho)
+
+    if not terms:
+        return True
+
+    q = relation.q
+    return group.wsum([weight % q for pt, weight in terms.values()],
+                      [pt for pt, weight in terms.values()]).is_infinite()
@@ -0,0 +1,152 @@
+"""Rejection counters and timing of the verification stages
+
+This file contains the counters kept by the staged verification in
+SigmaProtocol.py. A proof passes through the stages in order,
+
+    - decode: the number and types of the values of the proof
+    - points: the generators, public keys and commitments are on the curve
+    - transcript: the Fiat-Shamir challenge is computed (non-interactive proofs)
+    - arithmetic: the verification equations are checked
+
+and is rejected as soon as one stage fails, so malformed proofs are
+rejected before any scalar multiplication is done. For every stage the
+number of rejected proofs and the total time spent in the stage are kept,
+and the number of accepted proofs is kept as well.
+
+The counters are kept per process, so worker processes have to send their
+counters back to be combined with the merge function.
+
+The file contains the following functions:
+    - passed: records the time of a stage a proof passed
+    - reject: records the time of a stage a proof failed and counts the rejection
+    - accept: counts an accepted proof
+    - getStats: returns a copy of the counters
+    - merge: adds counters from another process to the counters of this process
+    - resetStats: sets all counters to zero
+    - formatStats: returns the counters as a printable table
+"""
+
+import time
+
+STAGES = ("decode", "points", "transcript", "arithmetic")
+
+clock = time.perf_counter_ns
+
+def _emptyStats():
+    stats = {stage: {"rejected": 0, "time_ns": 0} for stage in STAGES}
+    stats["accepted"] = 0
+
+    return stats
+
+_stats = _emptyStats()
+
+def passed(stage, start):
+    """Records the time of a stage a proof passed
+
+    Args:
+        stage (str): the name of the stage
+        start (int): the clock value at the start of the stage
+
+    Returns:
+        (int): the clock value at the end of the stage, the start of the next stage
+    """
+
+    now = clock()
+    _stats[stage]["time_ns"] += now - start
+
+    return now
+
+def reject(stage, start=None):
+    """Records the time of a stage a proof failed and counts the rejection
+
+    Args:
+        stage (str): the name of the stage
+        start (int): the clock value at the start of the stage,
+                     no time is recorded if None
+
+    Returns:
+        (bool): False, so the verification can return the result of reject
+    """
+
+    if start is not None:
+        _stats[stage]["time_ns"] += clock() - start
+    _stats[stage]["rejected"] += 1
+
+    return False
+
+def accept():
+    """Counts an accepted proof
+
+    No args
+
+    Returns:
+        (bool): True, so the verification can return the result of accept
+    """
+
+    _stats["accepted"] += 1
+
+    return True
+
+def getStats():
+    """Returns a copy of the counters
+
+    No args
+
+    Returns:
+        (dict): for every stage a dict with the number of rejected proofs
+                and the time spent in the stage in nanoseconds,
+                and the number of accepted proofs
+    """
+
+    stats = {stage: dict(_stats[stage]) for stage in STAGES}
+    stats["accepted"] = _stats["accepted"]
+
+    return stats
+
+def merge(stats):
+    """Adds counters from another process to the counters of this process
+
+    Args:
+        stats (dict): counters as returned by getStats
+
+    Returns:
+        None
+    """
+
+    for stage in STAGES:
+        _stats[stage]["rejected"] += stats[stage]["rejected"]
+        _stats[stage]["time_ns"] += stats[stage]["time_ns"]
+    _stats["accepted"] += stats["accepted"]
+
+def resetStats():
+    """Sets all counters to zero
+
+    No args
+
+    Returns:
+        None
+    """
+
+    global _stats
+    _stats = _emptyStats()
+
+def formatStats(stats=None):
+    """Returns the counters as a printable table
+
+    Args:
+        stats (dict): counters as returned by getStats,
+                      the counters of this process if None
+
+    Returns:
+        (str): one line per stage with the rejections and the time spent
+    """
+
+    if stats is None:
+        stats = getStats()
+
+    lines = ["%-12s %10s %12s" % ("stage", "rejected", "time (ms)")]
+    for stage in STAGES:
+        lines.append("%-12s %10d %12.1f" % (stage, stats[stage]["rejected"], stats[stage]["time_ns"] / 1e6))
+    lines.append("%-12s %10d" % ("accepted", stats["accepted"]))
+
+    return "\n".join(lines)
@@ -0,0 +1,152 @@
+"""Benchmarks of the proofs
+
+This file times proof generation and verification of the interactive and
+non-interactive proofs of knowledge of a representation for an increasing
+number of witnesses n, and compares the verification with one
+multi-scalar multiplication to a verification computing each of
+the n+1 products on its own.
+
+It also compares the (a, z) form of the non-interactive proof of knowledge
+with the compact (e, z) form with 128 bit challenges, in time and proof size.
+See NIProofOfKnowledge.py for the security notes on the compact form.
+
+The times are measured with time.process_time_ns, like the time taking
+at the end of the protocol files, and are reported in microseconds
+as the average over a number of runs.
+
+Run with "python3 benchmark.py [runs]", by default 20 runs per measurement.
+
+The file contains the following functions:
+    - timeIt: returns the average time of a function in microseconds
+    - naiveVerify: verifies a representation proof without multi-scalar multiplication
+    - benchmarkRepresentation: prints the timings for the representation proofs
+    - benchmarkShortChallenge: prints the timings and sizes of the two
+                               forms of the non-interactive proof of knowledge
+"""
+
+import NIProofOfKnowledge as NIPoK
+import ProofOfRepresentation as PoR
+import NIProofOfRepresentation as NIPoR
+import Encoding
+import sys
+import time
+
+SIZES = (1, 2, 4, 8, 16, 32, 64)
+
+def timeIt(function, runs):
+    """Returns the average time of a function
+
+    Args:
+        function (function): the function to time, called without arguments
+        runs (int): the number of times the function is called
+
+    Returns:
+        (float): the average time in microseconds
+    """
+
+    start = time.process_time_ns()
+    for _ in range(runs):
+        function()
+
+    return (time.process_time_ns() - start) / runs / 1000
+
+def naiveVerify(group, generators, h, proof):
+    """Verifies an interactive representation proof computing every product on its own
+
+    Args:
+        group (EcGroup): the EC group from an EC over a finite field
+        generators (list of EcPt): the n group generators
+        h (EcPt): the Prover public key
+        proof (EcPt, Bn, tuple of Bn): commitment, challenge and responses
+
+    Returns:
+        (bool) : returns true only if the proof is accepted, else false
+    """
+
+    a, e, z = proof
+
+    lhs = group.infinite()
+    for z_i, g_i in zip(z, generators):
+        lhs = lhs + z_i*g_i
+
+    return lhs == a + e*h and all(group.check_point(g) for g in generators + [h])
+
+def benchmarkRepresentation(runs):
+    """Prints the timings of the representation proofs for every n in SIZES
+
+    Args:
+        runs (int): the number of runs per measurement
+
+    Returns:
+        None
+    """
+
+    print("n    PoR gen   PoR verify   naive verify   NIPoR gen   NIPoR verify   (us)")
+    for n in SIZES:
+        group, q, generators = PoR.groupGen(n)
+        w, h = PoR.keyGen(q, generators)
+        proof = PoR.proofGen(q, generators, w)
+        niProof = NIPoR.proofGen(q, generators, w, h)
+        assert PoR.verify(group, generators, h, proof)
+        assert naiveVerify(group, generators, h, proof)
+        assert NIPoR.verify(group, generators, h, niProof)
+
+        print("%-4d %8.0f %12.0f %14.0f %11.0f %14.0f" % (
+            n,
+            timeIt(lambda: PoR.proofGen(q, generators, w), runs),
+            timeIt(lambda: PoR.verify(group, generators, h, proof), runs),
+            timeIt(lambda: naiveVerify(group, generators, h, proof), runs),
+            timeIt(lambda: NIPoR.proofGen(q, generators, w, h), runs),
+            timeIt(lambda: NIPoR.verify(group, generators, h, niProof), runs)))
+
+def benchmarkShortChallenge(runs):
+    """Prints the timings and sizes of the (a, z) and (e, z) forms of NIPoK
+
+    Args:
+        runs (int): the number of runs per measurement
+
+    Returns:
+        None
+    """
+
+    group, q, g = NIPoK.groupGen()
+    w, h = NIPoK.keyGen(q, g)
+    proof = NIPoK.proofGen(q, g, w, h)
+    shortProof = NIPoK.proofGen_short(q, g, w, h)
+    assert NIPoK.verify(group, g, h, proof)
+    assert NIPoK.verify_short(group, g, h, shortProof)
+
+    #The challenges of the two forms, for timing e*h on its own
+    e = NIPoK.SigmaProtocol.Prover_challenge(NIPoK.getRelation(group, g), (h,), (proof[0],))
+    shortE = shortProof[0]
+
+    #Sizes with a compressed point and fixed length scalars, the response
+    #takes as many bytes as the group order, the short challenge CHALLENGE_BITS
+    qlen = (q.num_bits() + 7) // 8
+    sizes = {
+        "(a, z)": len(proof[0].export()) + qlen,
+        "(e, z)": NIPoK.CHALLENGE_BITS // 8 + qlen,
+    }
+
+    print("form     gen (us)   verify (us)   e*h (us)   size (bytes)   encoded (bytes)")
+    print("%-8s %8.0f %13.0f %10.0f %14d %17d" % (
+        "(a, z)",
+        timeIt(lambda: NIPoK.proofGen(q, g, w, h), runs),
+        timeIt(lambda: NIPoK.verify(group, g, h, proof), runs),
+        timeIt(lambda: e*h, runs),
+        sizes["(a, z)"],
+        len(Encoding.encodeRecord(proof))))
+    print("%-8s %8.0f %13.0f %10.0f %14d %17d" % (
+        "(e, z)",
+        timeIt(lambda: NIPoK.proofGen_short(q, g, w, h), runs),
+        timeIt(lambda: NIPoK.verify_short(group, g, h, shortProof), runs),
+        timeIt(lambda: shortE*h, runs),
+        sizes["(e, z)"],
+        len(Encoding.encodeRecord(shortProof))))
+
+
+if __name__ == '__main__':
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    benchmarkRepresentation(runs)
+    print()
+    benchmarkShortChallenge(runs)
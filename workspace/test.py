@@ -3,6 +3,24 @@ import ProofOfKnowledge as PoK
 import NIProofOfKnowledge as NIPoK
 import ProofOfEquality as PoE
 import NIProofOfEquality as NIPoE
+import ProofOfRepresentation as PoR
+import NIProofOfRepresentation as NIPoR
+import Audit
+import CommandLine
+import DeterministicNonce
+import Encoding
+import Generators
+import KeyTables
+import Parallel
+import SharedTables
+import SigmaProtocol
+import VerifyStats
+import itertools
+import json
+import os
+import tempfile
+import time
+import tracemalloc
 
 class TestPoK(unittest.TestCase):
     def test_proof_correct_values(self):
@@ -48,6 +66,50 @@ class TestNIPoK(unittest.TestCase):
 
         self.assertFalse(NIPoK.verify(group, g, h, proof))
 
+class TestNIPoKShort(unittest.TestCase):
+    def test_proof_correct_values(self):
+        group, q, g = NIPoK.groupGen()
+        w, h = NIPoK.keyGen(q, g)
+        proof = NIPoK.proofGen_short(q, g, w, h)
+
+        self.assertTrue(NIPoK.verify_short(group, g, h, proof))
+        self.assertLessEqual(proof[0].num_bits(), NIPoK.CHALLENGE_BITS)
+
+    def test_proof_wrong_witness(self):
+        group, q, g = NIPoK.groupGen()
+        w, h = NIPoK.keyGen(q, g)
+        proof = NIPoK.proofGen_short(q, g, 0, h)
+
+        self.assertFalse(NIPoK.verify_short(group, g, h, proof))
+
+    def test_proof_wrong_public_key(self):
+        group, q, g = NIPoK.groupGen()
+        w, h = NIPoK.keyGen(q, g)
+        proof = NIPoK.proofGen_short(q, g, w, h)
+
+        self.assertFalse(NIPoK.verify_short(group, g, 2*g, proof))
+
+    def test_long_challenge_rejected(self):
+        group, q, g = NIPoK.groupGen()
+        w, h = NIPoK.keyGen(q, g)
+        e, z = NIPoK.proofGen_short(q, g, w, h)
+
+        self.assertFalse(NIPoK.verify_short(group, g, h, (e + q, z)))
+
+    def test_seed_differs_from_full_form(self):
+        group, q, g = NIPoK.groupGen()
+        w, h = NIPoK.keyGen(q, g)
+        seed = DeterministicNonce.newSeed()
+        a, z1 = NIPoK.proofGen(q, g, w, h, seed)
+        e, z2 = NIPoK.proofGen_short(q, g, w, h, seed)
+
+        #With the same nonce a = z1*g + e1*h = z2*g + e*h
+        self.assertNotEqual(NIPoK.Prover_challenge_short(g, h, a), e)
+        self.assertNotEqual(z2*g + e*h, a)
+        self.assertEqual(NIPoK.proofGen_short(q, g, w, h, seed), (e, z2))
+        self.assertNotEqual(DeterministicNonce.deriveNonce(q, w, (g, h), seed),
+                            DeterministicNonce.deriveNonce(q, w, (g, h), seed, NIPoK.SHORT_DOMAIN))
+
 class TestPoE(unittest.TestCase):
     def test_proof_correct_values(self):
         group, q, g1, g2 = PoE.groupGen()
@@ -105,7 +167,878 @@ class TestNIPoE(unittest.TestCase):
         proof = NIPoE.proofGen(q, g1, g2, h1, h2, w)
 
         self.assertFalse(NIPoE.verify(group, g1, g2, h2, h1, proof))
-     
+
+class TestPoR(unittest.TestCase):
+    def test_proof_correct_values(self):
+        group, q, generators = PoR.groupGen(4)
+        w, h = PoR.keyGen(q, generators)
+        proof = PoR.proofGen(q, generators, w)
+
+        self.assertTrue(PoR.verify(group, generators, h, proof))
+
+    def test_proof_wrong_witness(self):
+        group, q, generators = PoR.groupGen(4)
+        w, h = PoR.keyGen(q, generators)
+        proof = PoR.proofGen(q, generators, w[:3] + (0,))
+
+        self.assertFalse(PoR.verify(group, generators, h, proof))
+
+    def test_proof_switched_generators(self):
+        group, q, generators = PoR.groupGen(2)
+        w, h = PoR.keyGen(q, generators)
+        proof = PoR.proofGen(q, generators, w)
+
+        self.assertFalse(PoR.verify(group, generators[::-1], h, proof))
+
+    def test_proof_refuses_seed(self):
+        group, q, generators = PoR.groupGen(2)
+        w, h = PoR.keyGen(q, generators)
+
+        with self.assertRaises(ValueError):
+            PoR.proofGen(q, generators, w, b"seed")
+
+class TestNIPoR(unittest.TestCase):
+    def test_proof_correct_values(self):
+        group, q, generators = NIPoR.groupGen(4)
+        w, h = NIPoR.keyGen(q, generators)
+        proof = NIPoR.proofGen(q, generators, w, h)
+
+        self.assertTrue(NIPoR.verify(group, generators, h, proof))
+
+    def test_proof_wrong_witness(self):
+        group, q, generators = NIPoR.groupGen(4)
+        w, h = NIPoR.keyGen(q, generators)
+        proof = NIPoR.proofGen(q, generators, w[:3] + (0,), h)
+
+        self.assertFalse(NIPoR.verify(group, generators, h, proof))
+
+    def test_proof_wrong_public_key(self):
+        group, q, generators = NIPoR.groupGen(4)
+        w, h = NIPoR.keyGen(q, generators)
+        proof = NIPoR.proofGen(q, generators, w, h)
+
+        self.assertFalse(NIPoR.verify(group, generators, 2*h, proof))
+
+    def test_proof_steps(self):
+        group, q, generators = NIPoR.groupGen(3)
+        w, h = NIPoR.keyGen(q, generators)
+        a, r = NIPoR.Prover_commitment(q, generators)
+        e = NIPoR.Prover_challenge(generators, h, a)
+        z = NIPoR.Prover_response(r, e, w, q)
+
+        self.assertTrue(NIPoR.verify(group, generators, h, (a, z)))
+
+class TestSigmaProtocol(unittest.TestCase):
+    def setUp(self):
+        group, q, g1, g2 = PoE.groupGen()
+        g = group.generator()
+        #h1 = w1*g1 + w2*g2 and h2 = w2*g
+        self.relation = SigmaProtocol.makeRelation(group, [[g1, g2], [None, g]])
+        self.witnesses = (q.random(), q.random())
+        self.statement = SigmaProtocol.statement(self.relation, self.witnesses)
+
+    def test_interactive_proof(self):
+        commitments, e, responses = SigmaProtocol.proofGen(self.relation, self.witnesses)
+
+        self.assertTrue(SigmaProtocol.verify(self.relation, self.statement, commitments, e, responses))
+        self.assertFalse(SigmaProtocol.verify(self.relation, self.statement, commitments, e+1, responses))
+
+    def test_non_interactive_proof(self):
+        commitments, responses = SigmaProtocol.proofGenNI(self.relation, self.witnesses, self.statement)
+
+        self.assertTrue(SigmaProtocol.verifyNI(self.relation, self.statement, commitments, responses))
+        self.assertFalse(SigmaProtocol.verifyNI(self.relation, self.statement[::-1], commitments, responses))
+
+    def test_wrong_witness(self):
+        witnesses = (self.witnesses[0], 0)
+        commitments, responses = SigmaProtocol.proofGenNI(self.relation, witnesses, self.statement)
+
+        self.assertFalse(SigmaProtocol.verifyNI(self.relation, self.statement, commitments, responses))
+
+    def test_wrong_number_of_values(self):
+        commitments, responses = SigmaProtocol.proofGenNI(self.relation, self.witnesses, self.statement)
+
+        self.assertFalse(SigmaProtocol.verifyNI(self.relation, self.statement, commitments[:1], responses))
+        self.assertFalse(SigmaProtocol.verifyNI(self.relation, self.statement, commitments, responses[:1]))
+
+class TestStagedVerification(unittest.TestCase):
+    def setUp(self):
+        self.group, self.q, self.g = NIPoK.groupGen()
+        self.w, self.h = NIPoK.keyGen(self.q, self.g)
+        self.proof = NIPoK.proofGen(self.q, self.g, self.w, self.h)
+        VerifyStats.resetStats()
+
+    def test_accepted(self):
+        self.assertTrue(NIPoK.verify(self.group, self.g, self.h, self.proof))
+
+        stats = VerifyStats.getStats()
+        self.assertEqual(stats["accepted"], 1)
+        self.assertTrue(all(stats[stage]["rejected"] == 0 for stage in VerifyStats.STAGES))
+
+    def test_malformed_rejected_before_arithmetic(self):
+        a, z = self.proof
+        self.assertFalse(NIPoK.verify(self.group, self.g, self.h, (a,)))
+        self.assertFalse(NIPoK.verify(self.group, self.g, self.h, (a, "z")))
+        self.assertFalse(NIPoK.verify(self.group, self.g, self.h, (a, z * self.q * self.q)))
+        self.assertFalse(PoK.verify(self.group, self.g, self.h, (a, None, z)))
+
+        stats = VerifyStats.getStats()
+        self.assertEqual(stats["decode"]["rejected"], 4)
+        self.assertEqual(stats["transcript"]["time_ns"], 0)
+        self.assertEqual(stats["arithmetic"]["time_ns"], 0)
+
+    def test_representation_responses_not_a_tuple(self):
+        group, q, generators = PoR.groupGen(2)
+        w, h = PoR.keyGen(q, generators)
+        a, e, z = PoR.proofGen(q, generators, w)
+        ni, responses = NIPoR.proofGen(q, generators, w, h)
+        self.assertFalse(PoR.verify(group, generators, h, (a, e, z[0])))
+        self.assertFalse(NIPoR.verify(group, generators, h, (ni, responses[0])))
+        self.assertFalse(NIPoR.verify(group, generators, (h,), (ni, responses)))
+
+        stats = VerifyStats.getStats()
+        self.assertEqual(stats["decode"]["rejected"], 3)
+        self.assertEqual(stats["arithmetic"]["time_ns"], 0)
+
+    def test_wrong_proof_rejected_in_arithmetic(self):
+        a, z = self.proof
+        self.assertFalse(NIPoK.verify(self.group, self.g, self.h, (a, z + 1)))
+
+        stats = VerifyStats.getStats()
+        self.assertEqual(stats["arithmetic"]["rejected"], 1)
+        self.assertEqual(stats["accepted"], 0)
+
+    def test_merge(self):
+        NIPoK.verify(self.group, self.g, self.h, self.proof)
+        VerifyStats.merge(VerifyStats.getStats())
+
+        self.assertEqual(VerifyStats.getStats()["accepted"], 2)
+
+class TestDeterministicNonce(unittest.TestCase):
+    def test_same_seed_same_proof(self):
+        group, q, g = NIPoK.groupGen()
+        w, h = NIPoK.keyGen(q, g)
+        seed = DeterministicNonce.newSeed()
+        proof1 = NIPoK.proofGen(q, g, w, h, seed)
+        proof2 = NIPoK.proofGen(q, g, w, h, seed)
+
+        self.assertEqual(proof1, proof2)
+        self.assertTrue(NIPoK.verify(group, g, h, proof1))
+
+    def test_different_seed_different_proof(self):
+        group, q, g1, g2 = NIPoE.groupGen()
+        w, h1, h2 = NIPoE.keyGen(q, g1, g2)
+        proof1 = NIPoE.proofGen(q, g1, g2, h1, h2, w, DeterministicNonce.newSeed())
+        proof2 = NIPoE.proofGen(q, g1, g2, h1, h2, w, DeterministicNonce.newSeed())
+
+        self.assertNotEqual(proof1[0], proof2[0])
+        self.assertTrue(NIPoE.verify(group, g1, g2, h1, h2, proof1))
+        self.assertTrue(NIPoE.verify(group, g1, g2, h1, h2, proof2))
+
+    def test_interactive_proofs_refuse_seed(self):
+        group, q, g = PoK.groupGen()
+        w, h = PoK.keyGen(q, g)
+        with self.assertRaises(ValueError):
+            PoK.proofGen(q, g, w, b"seed")
+
+        group, q, g1, g2 = PoE.groupGen()
+        w, h1, h2 = PoE.keygen(q, g1, g2)
+        with self.assertRaises(ValueError):
+            PoE.proofGen(q, g1, g2, w, b"seed")
+
+    def test_batch_matches_single(self):
+        group, q, g = NIPoK.groupGen()
+        keys = [NIPoK.keyGen(q, g) for _ in range(5)]
+        seed = DeterministicNonce.newSeed()
+        nonces = DeterministicNonce.deriveNonces(q, [w for w, h in keys], [(g, h) for w, h in keys], seed)
+
+        for i, (w, h) in enumerate(keys):
+            r = DeterministicNonce.deriveNonce(q, w, (g, h), seed + i.to_bytes(8, "big"))
+            self.assertEqual(nonces[i], r)
+            self.assertTrue(0 < r < q)
+
+class TestEncoding(unittest.TestCase):
+    def test_record_round_trip(self):
+        group, q, g = NIPoK.groupGen()
+        record = (g, group.infinite(), q.random(), -q, 0)
+
+        self.assertEqual(Encoding.decodeRecord(group, Encoding.encodeRecord(record)), record)
+
+    def test_stream_round_trip(self):
+        import io
+        stream = io.BytesIO()
+        Encoding.writeRecords(stream, [b"abc", b"", b"de"])
+        stream.seek(0)
+
+        self.assertEqual(list(Encoding.readRecords(stream)), [b"abc", b"", b"de"])
+
+    def test_truncated_record(self):
+        group, q, g = NIPoK.groupGen()
+
+        with self.assertRaises(ValueError):
+            Encoding.decodeRecord(group, Encoding.encodeRecord((g,))[:-1])
+
+    def test_corrupted_point(self):
+        group, q, g = NIPoK.groupGen()
+        data = bytearray(Encoding.encodeRecord((g, q.random())))
+        #Tag, length and the conversion byte come first, this flips a bit of x
+        data[12] ^= 1
+
+        with self.assertRaises(ValueError):
+            Encoding.decodeRecord(group, bytes(data))
+
+class TestProofGenBatch(unittest.TestCase):
+    def test_pok_batch(self):
+        group, q, g = PoK.groupGen()
+        keys = [PoK.keyGen(q, g) for _ in range(5)]
+        proofs = PoK.proofGen_batch(q, g, [w for w, h in keys], chunk_size=2)
+
+        for (w, h), proof in zip(keys, proofs):
+            self.assertTrue(PoK.verify(group, g, h, Encoding.decodeRecord(group, proof)))
+
+    def test_nipok_batch_matches_proofGen(self):
+        group, q, g = NIPoK.groupGen()
+        keys = [NIPoK.keyGen(q, g) for _ in range(5)]
+        seed = DeterministicNonce.newSeed()
+        proofs = list(NIPoK.proofGen_batch(q, g, keys, seed, chunk_size=2))
+
+        self.assertEqual(len(proofs), 5)
+        for i, (w, h) in enumerate(keys):
+            proof = Encoding.decodeRecord(group, proofs[i])
+            self.assertEqual(proof, NIPoK.proofGen(q, g, w, h, seed + i.to_bytes(8, "big")))
+            self.assertTrue(NIPoK.verify(group, g, h, proof))
+
+    def test_poe_batch_wrong_witness(self):
+        group, q, g1, g2 = PoE.groupGen()
+        w, h1, h2 = PoE.keygen(q, g1, g2)
+        proofs = PoE.proofGen_batch(q, g1, g2, [w, 0])
+
+        self.assertEqual([PoE.verify(group, g1, g2, h1, h2, Encoding.decodeRecord(group, proof))
+                          for proof in proofs], [True, False])
+
+    def test_interactive_batch_refuses_seed(self):
+        group, q, g1, g2 = PoE.groupGen()
+        w, h1, h2 = PoE.keygen(q, g1, g2)
+        with self.assertRaises(ValueError):
+            list(PoE.proofGen_batch(q, g1, g2, [w], b"seed"))
+        with self.assertRaises(ValueError):
+            list(PoK.proofGen_batch(q, g1, [w], b"seed"))
+
+    def test_representation_batch(self):
+        group, q, generators = NIPoR.groupGen(3)
+        relation = NIPoR.getRelation(group, generators)
+        keys = [NIPoR.keyGen(q, generators) for _ in range(4)]
+        seed = DeterministicNonce.newSeed()
+        instances = [(w, (h,)) for w, h in keys]
+        serial = list(SigmaProtocol.proofGen_batch(relation, instances, False, seed, chunk_size=3))
+        parallel = list(SigmaProtocol.proofGen_batch(relation, instances, False, seed, workers=2, chunk_size=3))
+
+        self.assertEqual(serial, parallel)
+        for i, (w, h) in enumerate(keys):
+            a, *z = Encoding.decodeRecord(group, serial[i])
+            self.assertEqual((a, tuple(z)), NIPoR.proofGen(q, generators, w, h, seed + i.to_bytes(8, "big")))
+
+    def test_legacy_steps(self):
+        from hashlib import sha256
+        group, q, g = NIPoK.groupGen()
+        w, h = NIPoK.keyGen(q, g)
+        a, r = NIPoK.Prover_commitment(q, g)
+        e = NIPoK.Prover_challenge(g, h, a)
+
+        self.assertEqual(a, r*g)
+        self.assertEqual(e, sha256(str(g+h+a).encode()).hexdigest())
+        self.assertEqual(NIPoK.Prover_response(r, e, w, q), r - SigmaProtocol.bn.Bn.from_hex(e)*w % q)
+        self.assertTrue(NIPoK.verify(group, g, h, (a, NIPoK.Prover_response(r, e, w, q))))
+
+    def test_nipoe_batch_workers(self):
+        group, q, g1, g2 = NIPoE.groupGen()
+        keys = [NIPoE.keyGen(q, g1, g2) for _ in range(6)]
+        seed = DeterministicNonce.newSeed()
+        serial = list(NIPoE.proofGen_batch(q, g1, g2, keys, seed, chunk_size=2))
+        parallel = list(NIPoE.proofGen_batch(q, g1, g2, keys, seed, workers=2, chunk_size=2))
+
+        self.assertEqual(serial, parallel)
+        for (w, h1, h2), proof in zip(keys, parallel):
+            self.assertTrue(NIPoE.verify(group, g1, g2, h1, h2, Encoding.decodeRecord(group, proof)))
+
+
+def _groupGenInWorker(chunk):
+    #Runs in a worker process of the shared table test
+    return [Encoding.encodePoint(pt) for n in chunk for pt in PoR.groupGen(n)[2]]
+
+def _failToMakeGenerators(n, group):
+    raise AssertionError("the generators were computed in a worker")
+
+def _initGeneratorsFromTable(name):
+    #Forgets the generators a forked worker inherits and makes computing
+    #them fail, so the worker can only get them from the shared table
+    Generators._generators.clear()
+    Generators.make_generators = _failToMakeGenerators
+    SharedTables.initGenerators(name)
+
+class TestCommandLine(unittest.TestCase):
+
+    def test_prove_and_verify_streams(self):
+        for name in CommandLine.PROTOCOLS:
+            keys = list(CommandLine.keygen(name, 5, chunk_size=2))
+            proofs = list(CommandLine.prove(name, keys, chunk_size=2))
+            proofs[1] = proofs[1][:-1] + bytes((proofs[1][-1] ^ 1,))
+            proofs[3] = b"junk"
+
+            self.assertEqual(list(CommandLine.verify(name, proofs, chunk_size=2)),
+                             [True, False, True, False, True], name)
+
+    def test_files_and_exit_status(self):
+        directory = tempfile.mkdtemp()
+        keys, proofs, results = (os.path.join(directory, name) for name in ("keys", "proofs", "results"))
+
+        self.assertEqual(CommandLine.main(["keygen", "nipoe", "-n", "4", "-o", keys, "-q"]), 0)
+        self.assertEqual(CommandLine.main(["prove", "nipoe", "-i", keys, "-o", proofs, "--seed", "00ff", "-q"]), 0)
+        self.assertEqual(CommandLine.main(["verify", "nipoe", "-i", proofs, "-o", results, "-q"]), 0)
+        with open(results) as f:
+            self.assertEqual(f.read().split(), ["accepted"] * 4)
+
+        #Verifying with the wrong protocol rejects every record
+        self.assertEqual(CommandLine.main(["verify", "poe", "-i", proofs, "-q"]), 1)
+
+        #A seed would make the nonces of the interactive proofs repeat across runs
+        self.assertEqual(CommandLine.main(["keygen", "poe", "-n", "2", "-o", keys, "-q"]), 0)
+        self.assertEqual(CommandLine.main(["prove", "poe", "-i", keys, "--seed", "00ff", "-q"]), 2)
+        with self.assertRaises(ValueError):
+            list(CommandLine.prove("poe", CommandLine.keygen("poe", 1), b"seed"))
+
+    def test_verify_workers(self):
+        keys = list(CommandLine.keygen("pok", 6))
+        proofs = list(CommandLine.prove("pok", keys))
+        proofs[2] = proofs[2][:-1] + bytes((proofs[2][-1] ^ 1,))
+
+        self.assertEqual(list(CommandLine.verify("pok", proofs, workers=2, chunk_size=2)),
+                         [True, True, False, True, True, True])
+
+    def test_verify_corrupted_point(self):
+        keys = list(CommandLine.keygen("nipok", 3))
+        proofs = list(CommandLine.prove("nipok", keys))
+        #A bit of the x coordinate of the public key
+        proofs[1] = proofs[1][:12] + bytes((proofs[1][12] ^ 1,)) + proofs[1][13:]
+
+        self.assertEqual(list(CommandLine.verify("nipok", proofs)), [True, False, True])
+
+class TestKeyTables(unittest.TestCase):
+
+    def setUp(self):
+        KeyTables.resetTables()
+        self.cap = KeyTables.MEMORY_CAP
+
+    def tearDown(self):
+        KeyTables.setMemoryCap(self.cap)
+        KeyTables.resetTables()
+
+    def test_hot_keys_get_tables(self):
+        group, q, g = NIPoK.groupGen()
+        w, h = NIPoK.keyGen(q, g)
+        data = Encoding.encodeRecord((h,))
+
+        decoded = [KeyTables.decodeStatement(group, data) for _ in range(KeyTables.HOT_USES + 2)]
+        self.assertEqual(decoded[0], (h,))
+        self.assertIsNot(decoded[0][0], decoded[1][0])
+        self.assertIs(decoded[-1][0], decoded[KeyTables.HOT_USES - 1][0])
+
+        stats = KeyTables.getStats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["tables"]), (2, KeyTables.HOT_USES, 1))
+        self.assertTrue(KeyTables.isValid(decoded[-1]))
+        self.assertIsNone(KeyTables.isValid((h,)))
+
+    def test_verify_with_tables(self):
+        group, q, g1, g2 = NIPoE.groupGen()
+        w, h1, h2 = NIPoE.keyGen(q, g1, g2)
+        data = Encoding.encodeRecord((h1, h2))
+        for _ in range(KeyTables.HOT_USES):
+            statement = KeyTables.decodeStatement(group, data)
+
+        proof = NIPoE.proofGen(q, g1, g2, h1, h2, w)
+        a1, a2, z = proof
+        for _ in range(2):
+            self.assertTrue(NIPoE.verify(group, g1, g2, *statement, proof))
+            self.assertFalse(NIPoE.verify(group, g1, g2, *statement, (a1, a2, z + 1)))
+            self.assertFalse(NIPoE.verify(group, g1, g2, *statement, (a2, a1, z)))
+
+        #The transcripts of the non-interactive proofs of knowledge and
+        #of a representation are kept in the tables as well
+        group, q, g = NIPoK.groupGen()
+        w, h = NIPoK.keyGen(q, g)
+        generators = NIPoR.groupGen(2)[2]
+        v, k = NIPoR.keyGen(q, generators)
+        for _ in range(KeyTables.HOT_USES):
+            hot = KeyTables.decodeStatement(group, Encoding.encodeRecord((h,)))
+            hotK = KeyTables.decodeStatement(group, Encoding.encodeRecord((k,)))
+
+        for _ in range(2):
+            self.assertTrue(NIPoK.verify(group, g, *hot, NIPoK.proofGen(q, g, w, h)))
+            self.assertFalse(NIPoK.verify(group, g, *hot, NIPoK.proofGen(q, g, w + 1, h)))
+            self.assertTrue(NIPoR.verify(group, generators, *hotK, NIPoR.proofGen(q, generators, v, k)))
+            self.assertFalse(NIPoR.verify(group, generators, *hotK, NIPoR.proofGen(q, generators, v[::-1], k)))
+
+    def test_least_frequently_used_evicted(self):
+        group, q, g = PoK.groupGen()
+        keys = [Encoding.encodeRecord((PoK.keyGen(q, g)[1],)) for _ in range(3)]
+        KeyTables.setMemoryCap(2 * (KeyTables.TABLE_BYTES + KeyTables.POINT_BYTES))
+
+        #The third key is counted past the 5 uses of the second table, gets
+        #its table at its 6th use, and evicts the second table
+        for uses, data in zip((10, 5, 8), keys):
+            for _ in range(uses):
+                KeyTables.decodeStatement(group, data)
+
+        stats = KeyTables.getStats()
+        self.assertEqual((stats["tables"], stats["built"], stats["evicted"], stats["hits"]), (2, 3, 1, 6 + 1 + 2))
+        self.assertLessEqual(stats["memory"], KeyTables.MEMORY_CAP)
+        self.assertEqual([(group.nid(), data) in KeyTables._tables for data in keys], [True, False, True])
+
+    def test_full_cache_not_churned(self):
+        group, q, g = PoK.groupGen()
+        keys = [Encoding.encodeRecord((PoK.keyGen(q, g)[1],)) for _ in range(4)]
+        KeyTables.setMemoryCap(2 * (KeyTables.TABLE_BYTES + KeyTables.POINT_BYTES))
+
+        #Three keys used equally often share two tables, the third key
+        #never gets ahead of the tables and is not admitted
+        for _ in range(100):
+            for data in keys[:3]:
+                KeyTables.decodeStatement(group, data)
+
+        stats = KeyTables.getStats()
+        self.assertEqual((stats["built"], stats["evicted"]), (2, 0))
+        self.assertEqual(stats["hits"], 2 * (100 - KeyTables.HOT_USES))
+
+        #Once the uses of the tables are halved three times, from 100 to 12,
+        #a new key takes over a table at its 13th use
+        for _ in range(3):
+            KeyTables._age()
+            KeyTables._ageTables()
+        for _ in range(12):
+            KeyTables.decodeStatement(group, keys[3])
+        self.assertEqual(KeyTables.getStats()["built"], 2)
+        KeyTables.decodeStatement(group, keys[3])
+
+        stats = KeyTables.getStats()
+        self.assertEqual((stats["built"], stats["evicted"]), (3, 1))
+        self.assertEqual([(group.nid(), data) in KeyTables._tables for data in keys], [False, True, False, True])
+
+class TestAudit(unittest.TestCase):
+
+    def setUp(self):
+        Audit.resetStats()
+        self.group, self.q, self.g1, self.g2 = PoE.groupGen()
+        self.relation = PoE.getRelation(self.group, self.g1, self.g2)
+        self.keys = [PoE.keygen(self.q, self.g1, self.g2) for _ in range(3)]
+
+    def _transcripts(self, count):
+        for i in range(count):
+            w, h1, h2 = self.keys[i % 3]
+            yield (h1, h2), PoE.proofGen(self.q, self.g1, self.g2, w)
+
+    def test_verify_batch(self):
+        instances = [(statement, proof[:2], proof[2], proof[3:]) for statement, proof in self._transcripts(6)]
+        self.assertTrue(SigmaProtocol.verifyBatch(self.relation, instances))
+        self.assertTrue(SigmaProtocol.verifyBatch(self.relation, []))
+
+        statement, commitments, e, responses = instances[4]
+        for wrong in ((statement, commitments, e + 1, responses),
+                      (statement[::-1], commitments, e, responses),
+                      (statement, commitments, None, responses),
+                      (statement, commitments, e, ())):
+            self.assertFalse(SigmaProtocol.verifyBatch(self.relation, instances[:4] + [wrong]))
+
+    def test_audit_findings(self):
+        records = [Encoding.encodeRecord(statement + proof) for statement, proof in self._transcripts(20)]
+        records[3] = records[3][:-1] + bytes((records[3][-1] ^ 1,))
+        records[8] = b"junk"
+        #A bit of the x coordinate of h1 and of a1, every point takes 59 bytes
+        records[12] = records[12][:12] + bytes((records[12][12] ^ 1,)) + records[12][13:]
+        records[14] = records[14][:130] + bytes((records[14][130] ^ 1,)) + records[14][131:]
+        records.append(records[5])
+
+        for workers in (None, 2):
+            Audit.resetStats()
+            results = list(Audit.audit("poe", records, workers, chunk_size=8, batch_size=4))
+
+            self.assertEqual([index for index, result, first in results], list(range(21)))
+            self.assertEqual([index for index, result, first in results if not result], [3, 8, 12, 14])
+            self.assertEqual([index for index, result, first in results if result is None], [8, 12, 14])
+            self.assertEqual([(index, first) for index, result, first in results if first is not None], [(20, 5)])
+
+            stats = Audit.getStats()
+            self.assertEqual((stats["accepted"], stats["rejected"], stats["malformed"], stats["repeated"]), (17, 1, 3, 1))
+            self.assertEqual(stats["fallbacks"], 1)
+
+    def test_challenge_window(self):
+        records = [Encoding.encodeRecord(statement + proof) for statement, proof in self._transcripts(12)]
+        #Repeats 2 and 13 transcripts after the first one
+        records.append(records[10])
+        records.append(records[0])
+
+        results = list(Audit.audit("poe", records, window=4))
+        self.assertEqual([(index, first) for index, result, first in results if first is not None], [(12, 10)])
+
+        results = list(Audit.audit("poe", records))
+        self.assertEqual([(index, first) for index, result, first in results if first is not None],
+                         [(12, 10), (13, 0)])
+
+        with self.assertRaises(ValueError):
+            list(Audit.audit("poe", records, window=1))
+
+    def test_only_interactive_protocols(self):
+        with self.assertRaises(ValueError):
+            list(Audit.audit("nipoe", []))
+
+    def test_prefetch(self):
+        def failing():
+            yield 1
+            raise ValueError("broken input")
+
+        self.assertEqual(list(Parallel.prefetch(range(10), 3)), list(range(10)))
+        values = Parallel.prefetch(failing())
+        self.assertEqual(next(values), 1)
+        with self.assertRaises(ValueError):
+            next(values)
+
+class TestSharedTables(unittest.TestCase):
+
+    def setUp(self):
+        self.group, self.q, self.generators = PoR.groupGen(4)
+
+    def test_shared_memory_round_trip(self):
+        block = SharedTables.createTable(self.generators)
+        try:
+            attached = SharedTables.attachTable(block.name)
+            self.assertEqual(SharedTables.tableNid(attached.buf), self.group.nid())
+            self.assertEqual(SharedTables.tableLength(attached.buf), 4)
+            self.assertEqual(SharedTables.readPoint(self.group, attached.buf, 2), self.generators[2])
+            self.assertEqual(SharedTables.readPoints(self.group, attached.buf), self.generators)
+            with self.assertRaises(IndexError):
+                SharedTables.readPoint(self.group, attached.buf, 4)
+        finally:
+            SharedTables._attached.pop(block.name).close()
+            block.close()
+            block.unlink()
+
+    def test_table_file_round_trip(self):
+        w, h = PoR.keyGen(self.q, self.generators)
+        path = os.path.join(tempfile.mkdtemp(), "keys.tbl")
+        SharedTables.writeTableFile(path, [h, self.generators[0]])
+
+        table = SharedTables.openTableFile(path)
+        self.assertEqual(SharedTables.readPoints(self.group, table), [h, self.generators[0]])
+        table.close()
+        os.remove(path)
+
+    def test_not_a_table(self):
+        with self.assertRaises(ValueError):
+            SharedTables.tableLength(b"\x00" * 16)
+
+    def test_load_generators(self):
+        block = SharedTables.shareGenerators(4, self.group)
+        try:
+            Generators._generators.pop(self.group.nid())
+            self.assertEqual(SharedTables.loadGenerators(block.buf), self.generators)
+            self.assertEqual(Generators.getGenerators(4, self.group), self.generators)
+        finally:
+            block.close()
+            block.unlink()
+
+    def test_workers_attach_generators(self):
+        block = SharedTables.shareGenerators(4, self.group)
+        try:
+            results = Parallel.mapChunks(_groupGenInWorker, [[2], [4]], workers=2,
+                                         initializer=_initGeneratorsFromTable, initargs=(block.name,))
+            self.assertEqual([[Encoding.decodePoint(self.group, pt) for pt in chunk] for chunk in results],
+                             [self.generators[:2], self.generators])
+        finally:
+            block.close()
+            block.unlink()
+
+    def test_worker_pool_of_a_command(self):
+        with CommandLine.workerPool("nipok", 2) as pool:
+            self.assertEqual(pool, {})
+        with CommandLine.workerPool("poe", 1) as pool:
+            self.assertEqual(pool, {})
+
+        with CommandLine.workerPool("nipoe", 2) as pool:
+            name, = pool["initargs"]
+            self.assertIs(pool["initializer"], SharedTables.initGenerators)
+            self.assertEqual(SharedTables.readPoints(self.group, SharedTables.attachTable(name).buf),
+                             self.generators[:2])
+            SharedTables._attached.pop(name).close()
+
+        #The block is removed once the command is done
+        with self.assertRaises(FileNotFoundError):
+            SharedTables.attachTable(name)
+
+#The performance tier only runs when PERF_SCALES is set, e.g.
+#PERF_SCALES=1000,10000,100000,1000000 python3 -m unittest test.TestPerformance
+#With PERF_RECORD=1 the budgets in perf_baseline.json are written from the measurements
+PERF_SCALES = [int(scale) for scale in os.environ.get("PERF_SCALES", "").split(",") if scale]
+PERF_RECORD = os.environ.get("PERF_RECORD") == "1"
+PERF_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "perf_baseline.json")
+
+def _tampered(i):
+    #Whether _tamperRecords changes the i'th record
+    return i % 7 == 3 or i % 11 == 5 or i % 13 == 9 or i % 17 == 13
+
+def _tamperRecords(name, records, keys):
+    #Makes every 7th proof fail the verification equation, every 11th fail
+    #decoding, every 13th claim the public keys of another key record and
+    #every 17th hold a commitment that is not a point of the curve
+    protocol = CommandLine.PROTOCOLS[name]
+    group = CommandLine.getParameters(name)[0]
+    for i, data in enumerate(records):
+        if i % 7 == 3:
+            data = data[:-1] + bytes((data[-1] ^ 1,))
+        elif i % 11 == 5:
+            data = data[:len(data) // 2]
+        elif i % 13 == 9:
+            publicKeys = Encoding.decodeRecord(group, keys[(i + 1) % len(keys)])[1:]
+            data = Encoding.encodeRecord(publicKeys + Encoding.decodeRecord(group, data)[protocol.publics:])
+        elif i % 17 == 13:
+            #A bit of the x coordinate, after the tag, length and conversion bytes
+            offset = len(Encoding.encodeRecord(Encoding.decodeRecord(group, data)[:protocol.publics])) + 12
+            data = data[:offset] + bytes((data[offset] ^ 1,)) + data[offset+1:]
+        yield data
+
+def _referenceVerify(name, data):
+    #Verifies a single proof record with the verify function of the protocol
+    protocol = CommandLine.PROTOCOLS[name]
+    group, q, generators = CommandLine.getParameters(name)
+    #Any decoding failure rejects the record, independently of
+    #the exceptions the command line expects
+    try:
+        values = Encoding.decodeRecord(group, data)
+    except Exception:
+        return False
+    if not all(isinstance(h, SigmaProtocol.ec.EcPt) for h in values[:protocol.publics]):
+        return False
+
+    return protocol.module.verify(group, *generators, *values[:protocol.publics], values[protocol.publics:])
+
+@unittest.skipUnless(PERF_SCALES, "performance tier, set PERF_SCALES to run it")
+class TestPerformance(unittest.TestCase):
+
+    KEYS = 16
+    SAMPLE = 64
+    REPRESENTATION_WITNESSES = 4
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.mkdtemp()
+        cls.measured = {}
+        cls.baseline = {}
+        if os.path.exists(PERF_BASELINE):
+            with open(PERF_BASELINE) as f:
+                cls.baseline = json.load(f)
+
+    @classmethod
+    def tearDownClass(cls):
+        if PERF_RECORD:
+            #The budgets leave room for slower machines and noisy runs
+            budgets = dict(cls.baseline)
+            for key, (us, kib, retained) in sorted(cls.measured.items()):
+                budgets[key] = {"us_per_op": round(us * 3 + 10), "peak_kib": round(kib * 2 + 512)}
+                if retained:
+                    budgets[key]["retained_bytes_per_op"] = retained
+            with open(PERF_BASELINE, "w") as f:
+                json.dump(budgets, f, indent=4, sort_keys=True)
+                f.write("\n")
+
+    def _measure(self, key, function, retained=0):
+        #Runs function, which returns the number of operations done,
+        #and checks the time per operation and the peak memory against the budget,
+        #operations that keep retained bytes per operation by design are allowed
+        #that much memory on top of the fixed budget
+        tracemalloc.start()
+        start = time.perf_counter_ns()
+        count = function()
+        elapsed = time.perf_counter_ns() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        us, kib = elapsed / count / 1e3, peak / 1024
+        old = self.measured.get(key, (0, 0, 0))
+        self.measured[key] = (max(us, old[0]), max(kib - count * retained / 1024, old[1], 0), retained)
+        if PERF_RECORD:
+            return
+
+        self.assertIn(key, self.baseline, "no budget for %s, run with PERF_RECORD=1" % key)
+        budget = self.baseline[key]
+        allowed = budget["peak_kib"] + count * budget.get("retained_bytes_per_op", 0) / 1024
+        self.assertLessEqual(us, budget["us_per_op"], "%s time per operation (us)" % key)
+        self.assertLessEqual(kib, allowed, "%s peak memory (KiB)" % key)
+
+    def _run(self, name, scale):
+        protocol = CommandLine.PROTOCOLS[name]
+        group, q, generators = CommandLine.getParameters(name)
+        pool = list(CommandLine.keygen(name, self.KEYS))
+        seed = DeterministicNonce.newSeed()
+        path = os.path.join(self.directory, "%s-%d" % (name, scale))
+
+        #The batch generation, written to a file as a stream of mixed valid and invalid proofs
+        def prove():
+            keys = itertools.islice(itertools.cycle(pool), scale)
+            with open(path, "wb") as f:
+                proofs = CommandLine.prove(name, keys, None if protocol.interactive else seed)
+                return Encoding.writeRecords(f, _tamperRecords(name, proofs, pool))
+        self._measure(name + ".prove", prove)
+
+        #The batch generation of the non-interactive proofs is deterministic,
+        #a sample is compared with the proofs of proofGen
+        if not protocol.interactive:
+            with open(path, "rb") as f:
+                for i, data in enumerate(Encoding.readRecords(f)):
+                    if i % self.SAMPLE or _tampered(i):
+                        continue
+                    w, *publicKeys = Encoding.decodeRecord(group, pool[i % self.KEYS])
+                    nonceSeed = seed + i.to_bytes(8, "big")
+                    if name == "nipok":
+                        proof = NIPoK.proofGen(q, *generators, w, *publicKeys, nonceSeed)
+                    else:
+                        proof = NIPoE.proofGen(q, *generators, *publicKeys, w, nonceSeed)
+                    self.assertEqual(Encoding.decodeRecord(group, data)[protocol.publics:], proof)
+
+        expected = bytearray(scale)
+        def reference():
+            with open(path, "rb") as f:
+                for i, data in enumerate(Encoding.readRecords(f)):
+                    expected[i] = _referenceVerify(name, data)
+            return scale
+        self._measure(name + ".verify", reference)
+        self.assertLess(0, sum(expected))
+        self.assertLess(sum(expected), scale)
+
+        #The command line verification, serially with the cached tables and with workers
+        for key, workers in (("verify_cached", None), ("verify_workers", 2)):
+            def fast():
+                with open(path, "rb") as f:
+                    results = CommandLine.verify(name, Encoding.readRecords(f), workers)
+                    for i, result in enumerate(results):
+                        if result != expected[i]:
+                            self.fail("%s %s differs from verify on record %d" % (name, key, i))
+                return scale
+            self._measure("%s.%s" % (name, key), fast)
+
+        #The batch verifier of the engine on the interactive transcripts, which carry
+        #their challenge, on batches of the proofs that pass and on one batch
+        #of the proofs that fail the verification equation
+        if protocol.interactive:
+            relation = protocol.module.getRelation(group, *generators)
+            def batch():
+                rows = protocol.publics
+                instances, failing, count = [], [], 0
+                with open(path, "rb") as f:
+                    for i, data in enumerate(Encoding.readRecords(f)):
+                        if _tampered(i) and i % 7 != 3:
+                            continue
+                        values = Encoding.decodeRecord(group, data)
+                        instance = (values[:rows], values[rows:2*rows], values[2*rows], values[2*rows+1:])
+                        if i % 7 == 3:
+                            failing.append(instance)
+                            continue
+                        instances.append(instance)
+                        if len(instances) == self.SAMPLE:
+                            self.assertTrue(SigmaProtocol.verifyBatch(relation, instances))
+                            count += len(instances)
+                            instances = []
+                self.assertTrue(SigmaProtocol.verifyBatch(relation, instances))
+                self.assertFalse(SigmaProtocol.verifyBatch(relation, failing))
+                return count + len(instances) + len(failing)
+            self._measure(name + ".verify_batch", batch)
+
+        #The audit of the interactive transcripts verifies them in batches,
+        #and keeps a bounded window of challenge hashes to find repeated challenges
+        if protocol.interactive:
+            def audit():
+                with open(path, "rb") as f:
+                    for i, result, first in Audit.audit(name, Encoding.readRecords(f)):
+                        if bool(result) != expected[i]:
+                            self.fail("%s audit differs from verify on record %d" % (name, i))
+                return scale
+            self._measure(name + ".audit", audit, retained=Audit.CHALLENGE_BYTES)
+
+        os.remove(path)
+
+    def _stream(self, name, scale, group, prove, verify, form=""):
+        #Times prove, which returns the record of the i'th proof, on a file of
+        #scale proofs with every 7th proof failing the verification equation,
+        #and verify, which returns whether the decoded record is accepted
+        path = os.path.join(self.directory, "%s%s-%d" % (name, form, scale))
+        def records():
+            for i in range(scale):
+                data = prove(i)
+                if i % 7 == 3:
+                    data = data[:-1] + bytes((data[-1] ^ 1,))
+                yield data
+        def generate():
+            with open(path, "wb") as f:
+                return Encoding.writeRecords(f, records())
+        self._measure("%s.prove%s" % (name, form), generate)
+
+        def check():
+            with open(path, "rb") as f:
+                for i, data in enumerate(Encoding.readRecords(f)):
+                    if verify(Encoding.decodeRecord(group, data)) != (i % 7 != 3):
+                        self.fail("%s%s verify is wrong on record %d" % (name, form, i))
+            return scale
+        self._measure("%s.verify%s" % (name, form), check)
+
+        os.remove(path)
+
+    def test_protocols(self):
+        for scale in PERF_SCALES:
+            for name in sorted(CommandLine.PROTOCOLS):
+                with self.subTest(protocol=name, scale=scale):
+                    self._run(name, scale)
+
+
+    def test_representation(self):
+        group, q, generators = PoR.groupGen(self.REPRESENTATION_WITNESSES)
+        pool = [PoR.keyGen(q, generators) for _ in range(self.KEYS)]
+        seed = DeterministicNonce.newSeed()
+
+        def provePoR(i):
+            w, h = pool[i % self.KEYS]
+            a, e, z = PoR.proofGen(q, generators, w)
+            return Encoding.encodeRecord((h, a, e) + z)
+        def verifyPoR(values):
+            h, a, e, *z = values
+            return PoR.verify(group, generators, h, (a, e, tuple(z)))
+
+        def proveNIPoR(i):
+            w, h = pool[i % self.KEYS]
+            a, z = NIPoR.proofGen(q, generators, w, h, seed + i.to_bytes(8, "big"))
+            return Encoding.encodeRecord((h, a) + z)
+        def verifyNIPoR(values):
+            h, a, *z = values
+            return NIPoR.verify(group, generators, h, (a, tuple(z)))
+
+        for scale in PERF_SCALES:
+            with self.subTest(protocol="por", scale=scale):
+                self._stream("por", scale, group, provePoR, verifyPoR)
+            with self.subTest(protocol="nipor", scale=scale):
+                self._stream("nipor", scale, group, proveNIPoR, verifyNIPoR)
+
+    def test_short(self):
+        group, q, (g,) = CommandLine.getParameters("nipok")
+        pool = [NIPoK.keyGen(q, g) for _ in range(self.KEYS)]
+        seed = DeterministicNonce.newSeed()
+
+        def prove(i):
+            w, h = pool[i % self.KEYS]
+            return Encoding.encodeRecord((h,) + NIPoK.proofGen_short(q, g, w, h, seed + i.to_bytes(8, "big")))
+        def verify(values):
+            h, e, z = values
+            return NIPoK.verify_short(group, g, h, (e, z))
+
+        for scale in PERF_SCALES:
+            with self.subTest(protocol="nipok", scale=scale):
+                self._stream("nipok", scale, group, prove, verify, "_short")
+
 
 if __name__=='__main__':
-	unittest.main()
\ No newline at end of file
+	unittest.main()